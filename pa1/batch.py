@@ -0,0 +1,116 @@
+from __future__ import print_function
+# Plans for many agents on one map at once. Queries are grouped by goal so everything built for a goal,
+# a heuristic table or a whole distance field, is built once and shared by every agent heading there.
+# Groups can be spread over a process pool; each worker gets the map, and the landmark tables if ALT is
+# used, once when it starts instead of with every query.
+import multiprocessing
+from timeit import default_timer as timer
+from planner import GridMap, HEURISTICS, Result, plan
+import heuristics
+
+# With type "field" no search runs at all: each goal gets one distance field and every agent follows
+# its policy, see fields.py
+FIELD = "field"
+
+class BatchResult:
+    def __init__(self, results, seconds, processes, goals):
+        # One Result per query, in the order the queries were given
+        self.results = results
+        self.seconds = seconds
+        self.processes = processes
+        self.goals = goals
+    def metrics(self):
+        found = [result for result in self.results if result.found()]
+        expanded = sum(result.expanded for result in self.results)
+        seconds = max(self.seconds, 1e-9)
+        return {"queries": len(self.results), "found": len(found), "goals": self.goals,
+                "processes": self.processes, "seconds": self.seconds,
+                "queries_per_second": len(self.results)/seconds,
+                "expanded": expanded, "expanded_per_second": expanded/seconds,
+                "mean_length": float(sum(len(result.path) for result in found))/len(found) if found else 0.0,
+                "mean_cost": float(sum(result.cost for result in found))/len(found) if found else 0.0}
+
+# Plans from every start in starts to goal. shared keeps what does not depend on the goal between
+# groups, like the cluster cache of HPA*
+def plan_group(gmap, goal, starts, type, options, shared):
+    if type == FIELD:
+        from fields import DistanceField
+        field = DistanceField(gmap, goal, options.get("weighted", True))
+        results = []
+        for start in starts:
+            path = field.path(start)
+            if not path:
+                results.append(Result([], None, 0))
+                continue
+            cost = sum(gmap.cost(gmap.index(pos)) for pos in path[1:])
+            results.append(Result(path, cost, 0))
+        return results
+    if type == "hpa":
+        if "hpa" not in shared:
+            from hpa import HPAStar
+            shared["hpa"] = HPAStar(gmap)
+        return [shared["hpa"].plan(start, goal) for start in starts]
+    name = options.get("heuristic", "manhattan")
+    if type in ("astar", "ara") and name in HEURISTICS:
+        # Built once per goal, the chunks of one goal's group reach a worker one after another so only
+        # the last one is kept
+        if shared.get("heuristic", (None, None, None))[:2] != (goal, name):
+            shared["heuristic"] = (goal, name, HEURISTICS[name](gmap, goal))
+        options = dict(options)
+        options["heuristic"] = shared["heuristic"][2]
+    return [plan(gmap, start, goal, type, **options) for start in starts]
+
+# The map each worker process plans on, built once by _start_worker, and what its groups share
+_worker_map = None
+_worker_shared = {}
+
+def _start_worker(rows, cols, puddle, grass, landmarks):
+    global _worker_map
+    _worker_map = GridMap(rows, cols)
+    _worker_map.puddle[:] = puddle
+    _worker_map.grass[:] = grass
+    if landmarks is not None:
+        heuristics.use_landmarks(_worker_map, landmarks[0], landmarks[1])
+
+def _worker_group(task):
+    goal, starts, type, options = task
+    return plan_group(_worker_map, goal, starts, type, options, _worker_shared)
+
+# Plans every (start, goal) query with the planner named by type, or FIELD, with options passed on as in
+# planner.plan. processes > 1 spreads the goal groups over a process pool, groups larger than chunk are
+# then split unless they share a field. Planning in this process keeps each group whole
+def plan_batch(gmap, queries, type="astar", processes=None, chunk=64, **options):
+    began = timer()
+    groups = {}
+    for number, (start, goal) in enumerate(queries):
+        groups.setdefault(goal, []).append((number, start))
+    tasks = []
+    for goal, members in groups.items():
+        size = chunk if processes and processes > 1 and type != FIELD else len(members)
+        for i in range(0, len(members), size):
+            tasks.append((goal, members[i:i+size]))
+    results = [None]*len(queries)
+    if not processes or processes <= 1:
+        shared = {}
+        for goal, members in tasks:
+            planned = plan_group(gmap, goal, [start for number, start in members], type, options, shared)
+            for (number, start), result in zip(members, planned):
+                results[number] = result
+        if "hpa" in shared:
+            shared["hpa"].close()
+        return BatchResult(results, timer() - began, 1, len(groups))
+    landmarks = None
+    if options.get("heuristic") == "alt":
+        found = heuristics.landmarks(gmap)
+        landmarks = (found.landmarks, found.tables)
+    pool = multiprocessing.Pool(processes, _start_worker,
+                                (gmap.rows, gmap.cols, bytes(gmap.puddle), bytes(gmap.grass), landmarks))
+    try:
+        work = [(goal, [start for number, start in members], type, options) for goal, members in tasks]
+        for (goal, members), planned in zip(tasks, pool.imap(_worker_group, work)):
+            for (number, start), result in zip(members, planned):
+                results[number] = result
+    finally:
+        pool.close()
+        pool.join()
+    return BatchResult(results, timer() - began, processes, len(groups))
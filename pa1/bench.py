@@ -0,0 +1,180 @@
+from __future__ import print_function
+# Timing for the headless planners and the stepped Agent, run with: python bench.py
+import os
+import random
+import sys
+from timeit import default_timer as timer
+from planner import GridMap, PathCache, bfs, dfs, ucs, astar, ara, dial, jps, bibfs, biucs, biastar
+from methods import Agent
+from batch import plan_batch
+from hpa import HPAStar
+
+# Same puddle and grass odds as Grid.random, start and goal are always left open
+def random_map(rows, cols, seed=None, grass=True):
+    rng = random.Random(seed)
+    gmap = GridMap(rows, cols)
+    for i in range(gmap.size):
+        if not rng.randint(0,10):
+            gmap.puddle[i] = 1
+        elif grass and not rng.randint(0,3):
+            gmap.grass[i] = 1
+    for corner in (0, gmap.size-1):
+        gmap.puddle[corner] = 0
+    return gmap
+
+def time_planner(planner, gmap, start, goal):
+    begin = timer()
+    result = planner(gmap, start, goal)
+    return timer() - begin, result
+
+# What Agent needs of gridworld.Grid, without pygame
+class StubGrid:
+    def __init__(self, gmap):
+        self.map = gmap
+        self.cache = PathCache()
+
+# Runs an Agent one make_step at a time to the end, the way the visualizer does minus the drawing. The
+# Agent's own messages are not printed
+def time_agent(type, gmap, start, goal):
+    agent = Agent(StubGrid(gmap), start, goal, type)
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        begin = timer()
+        while not (agent.finished or agent.failed):
+            agent.make_step()
+        seconds = timer() - begin
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    gmap.listeners.remove(agent.map_changed)
+    gmap.clear_path()
+    return seconds, agent.result()
+
+# Same as bench_blind and bench_weighted for the stepped Agent, one make_step per expansion
+def bench_stepped(sizes, types, grass=False):
+    print("%-6s %-11s %10s %8s %10s %12s" % ("size", "agent", "expanded", "cost", "seconds", "us/expanded"))
+    for size in sizes:
+        gmap = random_map(size, size, seed=size, grass=grass)
+        for type in types:
+            seconds, result = time_agent(type, gmap, (0, 0), (size-1, size-1))
+            print("%-6d %-11s %10d %8s %10.3f %12.3f" % (size, "agent-" + type, result.expanded, result.cost,
+                seconds, 1e6*seconds/max(result.expanded, 1)))
+
+# Runs BFS and DFS corner to corner on square maps of growing size. Time per expanded node should
+# stay flat as the map grows if the searches are linear
+def bench_blind(sizes):
+    print("%-6s %-5s %10s %10s %12s" % ("size", "algo", "expanded", "seconds", "us/expanded"))
+    for size in sizes:
+        gmap = random_map(size, size, seed=size, grass=False)
+        for name, planner in (("bfs", bfs), ("dfs", dfs)):
+            seconds, result = time_planner(planner, gmap, (0, 0), (size-1, size-1))
+            print("%-6d %-5s %10d %10.3f %12.3f" % (size, name, result.expanded, seconds,
+                1e6*seconds/max(result.expanded, 1)))
+
+# Runs UCS and A* corner to corner on maps with grass, where edges get relaxed
+def bench_weighted(sizes, planners, grass=True):
+    print("%-6s %-5s %10s %8s %10s %12s" % ("size", "algo", "expanded", "cost", "seconds", "us/expanded"))
+    for size in sizes:
+        gmap = random_map(size, size, seed=size, grass=grass)
+        for name, planner in planners:
+            seconds, result = time_planner(planner, gmap, (0, 0), (size-1, size-1))
+            print("%-6d %-5s %10d %8s %10.3f %12.3f" % (size, name, result.expanded, result.cost, seconds,
+                1e6*seconds/max(result.expanded, 1)))
+
+# Optimal A*, A* weighted by 10 and JPS on maps with puddles but no grass
+def bench_open(sizes):
+    weighted = lambda gmap, start, goal: astar(gmap, start, goal, heuristic_weight=10)
+    bench_weighted(sizes, (("astar", astar), ("a*w=10", weighted), ("jps", jps)), grass=False)
+
+# One-way searches against their bidirectional versions. Start and goal sit on the middle row, away
+# from the edges, where a one-way search floods a diamond twice the area of the two half-size ones
+def bench_bidirectional(sizes):
+    optimal = lambda gmap, start, goal: astar(gmap, start, goal, heuristic_weight=1)
+    pairs = (("bfs", bfs), ("bibfs", bibfs), ("ucs", ucs), ("biucs", biucs), ("a*w=1", optimal), ("biastar", biastar))
+    print("%-6s %-8s %10s %8s %10s" % ("size", "algo", "expanded", "cost", "seconds"))
+    for size in sizes:
+        gmap = random_map(size, size, seed=size)
+        start = (size//2, size//4)
+        goal = (size//2, 3*size//4)
+        for pos in (start, goal):
+            gmap.puddle[gmap.index(pos)] = 0
+        for name, planner in pairs:
+            seconds, result = time_planner(planner, gmap, start, goal)
+            print("%-6d %-8s %10d %8s %10.3f" % (size, name, result.expanded, result.cost, seconds))
+
+# HPA* against optimal Dial on random start/goal pairs, after building the whole cluster cache once
+def bench_hierarchical(sizes, queries=10):
+    print("%-6s %8s %10s %10s %10s %10s %8s" % ("size", "clusters", "precompute", "hpa mean", "dial mean", "expanded", "cost/opt"))
+    for size in sizes:
+        gmap = random_map(size, size, seed=size)
+        rng = random.Random(size)
+        search = HPAStar(gmap)
+        begin = timer()
+        search.precompute()
+        precompute = timer() - begin
+        hpaTime = dialTime = expanded = ratio = found = 0
+        for i in range(queries):
+            start = goal = None
+            while start is None or gmap.puddle[gmap.index(start)] or gmap.puddle[gmap.index(goal)]:
+                start = (rng.randrange(size), rng.randrange(size))
+                goal = (rng.randrange(size), rng.randrange(size))
+            seconds, result = time_planner(lambda gmap, start, goal: search.plan(start, goal), gmap, start, goal)
+            optimalSeconds, optimal = time_planner(dial, gmap, start, goal)
+            hpaTime += seconds
+            dialTime += optimalSeconds
+            expanded += result.expanded
+            if optimal.cost and result.cost:
+                ratio += float(result.cost)/optimal.cost
+                found += 1
+        print("%-6d %8d %10.3f %10.4f %10.4f %10d %8.3f" % (size, search.clusterRows*search.clusterCols, precompute,
+            hpaTime/queries, dialTime/queries, expanded//queries, ratio/max(found, 1)))
+        search.close()
+
+# Full search counters for the four classic searches, A* over a range of heuristic weights and with
+# each heuristic, and ARA*, to see what each weight trades in path cost for fewer expansions
+def bench_stats(sizes, weights=(1, 2, 5, 10)):
+    planners = [("dfs", dfs), ("bfs", bfs), ("ucs", ucs)]
+    for weight in weights:
+        planners.append(("a*w=%d" % weight, lambda gmap, start, goal, weight=weight: astar(gmap, start, goal, heuristic_weight=weight)))
+    for name in ("alt", "table"):
+        planners.append(("a*" + name, lambda gmap, start, goal, name=name: astar(gmap, start, goal, heuristic=name)))
+    planners.append(("ara", ara))
+    print("%-6s %-7s %10s %10s %8s %8s %7s %8s %10s %6s" % ("size", "algo", "expanded", "generated", "peak",
+        "relaxed", "length", "cost", "ms", "bound"))
+    for size in sizes:
+        gmap = random_map(size, size, seed=size)
+        for name, planner in planners:
+            stats = planner(gmap, (0, 0), (size-1, size-1)).stats
+            print("%-6d %-7s %10d %10d %8d %8d %7d %8s %10.2f %6s" % (size, name, stats.expanded, stats.generated,
+                stats.peak_frontier, stats.relaxations, stats.length, stats.cost, 1000*stats.seconds,
+                "-" if stats.bound is None else "%.2f" % stats.bound))
+
+# Many agents heading for a few goals, planned one by one with A*, with A* sharing a goal-distance
+# table per goal, with one distance field per goal, and on a process pool
+def bench_batch(sizes, agents=200, goals=4, processes=4):
+    print("%-6s %-12s %6s %10s %10s %10s" % ("size", "batch", "found", "seconds", "plans/s", "expanded"))
+    for size in sizes:
+        gmap = random_map(size, size, seed=size)
+        rng = random.Random(size)
+        cells = [index for index in range(gmap.size) if not gmap.puddle[index]]
+        targets = [gmap.pos(rng.choice(cells)) for i in range(goals)]
+        queries = [(gmap.pos(rng.choice(cells)), rng.choice(targets)) for i in range(agents)]
+        for name, type, pool, options in (("astar", "astar", None, {}), ("astar+table", "astar", None, {"heuristic": "table"}),
+                                          ("field", "field", None, {}), ("field/pool", "field", processes, {})):
+            metrics = plan_batch(gmap, queries, type, pool, **options).metrics()
+            print("%-6d %-12s %6d %10.3f %10.1f %10d" % (size, name, metrics["found"], metrics["seconds"],
+                metrics["queries_per_second"], metrics["expanded"]))
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [250, 500, 1000, 1500]
+    bench_blind(sizes)
+    bench_stepped(sizes, ("bfs", "dfs"))
+    bench_weighted(sizes, (("ucs", ucs), ("dial", dial), ("astar", astar)))
+    # The stepped Agent on the heap (ucs) and on Dial's bucket queue
+    bench_stepped(sizes, ("ucs", "dial"), grass=True)
+    bench_open(sizes)
+    bench_bidirectional(sizes)
+    bench_hierarchical(sizes)
+    bench_stats(sizes)
+    bench_batch(sizes)
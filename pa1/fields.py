@@ -0,0 +1,111 @@
+from __future__ import print_function
+# Distance fields: the distance from every cell to one goal, computed over NumPy arrays. Once a
+# field is built any number of agents can read off their next move without searching.
+import numpy as np
+from planner import ACTIONS, MAX_COST
+
+# Distance stored for cells that cannot reach the goal
+UNREACHABLE = -1
+
+# Flat indices of the in range neighbors of every index in idx, puddles are not filtered out
+def _neighbors(gmap, idx):
+    cols = gmap.cols
+    col = idx % cols
+    return np.concatenate((idx[col > 0] - 1, idx[idx >= cols] - cols,
+                           idx[col < cols-1] + 1, idx[idx < gmap.size - cols] + cols))
+
+def _flags(gmap):
+    puddle = np.frombuffer(bytes(gmap.puddle), dtype=np.uint8).astype(bool)
+    grass = np.frombuffer(bytes(gmap.grass), dtype=np.uint8).astype(bool)
+    return puddle, grass
+
+# Wavefront BFS from the goal, every move costs 1. Each wave is expanded as one array operation
+def wavefront(gmap, goal):
+    puddle, grass = _flags(gmap)
+    dist = np.full(gmap.size, UNREACHABLE, dtype=np.int32)
+    wave = np.array([gmap.index(goal)], dtype=np.int64)
+    dist[wave] = 0
+    level = 0
+    while wave.size:
+        level += 1
+        wave = np.unique(_neighbors(gmap, wave))
+        wave = wave[(dist[wave] == UNREACHABLE) & ~puddle[wave]]
+        dist[wave] = level
+    return dist.reshape(gmap.rows, gmap.cols)
+
+# Dijkstra from the goal with the 1/10 grass costs. Costs are small integers, so cells are settled
+# one cost level at a time (Dial's buckets) and each level is expanded as one array operation.
+# Moving from a cell into a neighbor costs the neighbor's cost, so a cell settled at level d puts
+# its neighbors in bucket d + cost(cell)
+def dijkstra(gmap, goal):
+    puddle, grass = _flags(gmap)
+    dist = np.full(gmap.size, UNREACHABLE, dtype=np.int32)
+    buckets = {0: [np.array([gmap.index(goal)], dtype=np.int64)]}
+    level = 0
+    while buckets:
+        if level not in buckets:
+            level += 1
+            continue
+        settled = np.unique(np.concatenate(buckets.pop(level)))
+        settled = settled[(dist[settled] == UNREACHABLE) & ~puddle[settled]]
+        dist[settled] = level
+        if settled.size:
+            for step, cells in ((1, settled[~grass[settled]]), (MAX_COST, settled[grass[settled]])):
+                if cells.size:
+                    buckets.setdefault(level + step, []).append(_neighbors(gmap, cells))
+        level += 1
+    return dist.reshape(gmap.rows, gmap.cols)
+
+class DistanceField:
+    # Distances from every cell to goal plus, for every cell, the index into ACTIONS of an optimal
+    # next move (-1 at the goal and where the goal cannot be reached)
+    def __init__(self, gmap, goal, weighted=True):
+        self.gmap = gmap
+        self.goal = goal
+        if weighted:
+            self.dist = dijkstra(gmap, goal)
+        else:
+            self.dist = wavefront(gmap, goal)
+        self.policy = self.make_policy(weighted)
+
+    # For each action, the cost of taking it plus the distance left from the cell it leads to. The
+    # best action is the one with the smallest total, ties go to the earlier action in ACTIONS
+    def make_policy(self, weighted):
+        rows, cols = self.dist.shape
+        puddle, grass = _flags(self.gmap)
+        reachable = self.dist != UNREACHABLE
+        if weighted:
+            step = np.where(grass, MAX_COST, 1).reshape(rows, cols)
+        else:
+            step = np.ones((rows, cols), dtype=np.int32)
+        worst = np.iinfo(np.int32).max
+        # Pad by one cell so every action can be read with a plain slice
+        total = np.full((rows+2, cols+2), worst, dtype=np.int64)
+        total[1:-1, 1:-1] = np.where(reachable, self.dist + step, worst)
+        options = np.stack([total[1+dr:rows+1+dr, 1+dc:cols+1+dc] for dr, dc in ACTIONS])
+        policy = np.argmin(options, axis=0).astype(np.int8)
+        policy[~reachable | (self.dist == 0)] = -1
+        return policy
+
+    # Returns the (row, col) an agent at pos should move to next, None at the goal or if stuck
+    def next_move(self, pos):
+        action = self.policy[pos[0], pos[1]]
+        if action < 0:
+            return None
+        return (pos[0] + ACTIONS[action][0], pos[1] + ACTIONS[action][1])
+
+    def distance(self, pos):
+        value = int(self.dist[pos[0], pos[1]])
+        if value == UNREACHABLE:
+            return None
+        return value
+
+    # Follows the policy from pos to the goal, empty if the goal cannot be reached
+    def path(self, pos):
+        if self.distance(pos) is None:
+            return []
+        path = [pos]
+        while pos != self.goal:
+            pos = self.next_move(pos)
+            path.append(pos)
+        return path
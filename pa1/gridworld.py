@@ -1,6 +1,10 @@
 import pygame, sys, random
 from pygame.locals import *
 from methods import *
+from planner import GridMap, PathCache
+from tracing import open_sink
+from batch import plan_batch
+from mapfile import save_map, load_map
 
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
@@ -15,8 +19,20 @@ PURPLE = (128, 0, 128)
 GOLD = (230, 230, 138)
 YELLOW = (255, 255, 0)
 
+PLAN_KEYS = {K_1: "dfs", K_2: "bfs", K_3: "ucs", K_4: "astar", K_5: "dial", K_6: "jps", K_7: "lpa",
+             K_8: "bibfs", K_9: "biucs", K_0: "biastar", K_h: "hpa", K_a: "ara"}
+# Weights 'w' cycles A* through and heuristics 'e' cycles through
+WEIGHTS = [1, 2, 5, 10]
+HEURISTIC_NAMES = ["manhattan", "alt", "table"]
+# Where 'l' keeps landmark tables between runs
+LANDMARK_DIR = "landmarks"
+# Agents 'b' plans for at once
+BATCH_AGENTS = 20
+# Where 's' saves the map and 'o' loads it from
+MAP_FILE = "grid.gmap"
+
 class GridWorld():
-    def __init__(self):
+    def __init__(self, sink=None):
         pygame.init()
         pygame.display.set_caption("Grid World")
         self.clock = pygame.time.Clock()
@@ -25,61 +41,174 @@ class GridWorld():
         self.font = pygame.font.SysFont("Calibri", 16)
         self.screen = pygame.display.set_mode(self.screen_res, pygame.HWSURFACE, 32)
         self.show_checked = True
+        # Only redraw and update the cells that changed since the last frame, 'd' toggles it
+        self.dirty_rects = True
+        # Milliseconds per frame spent stepping the search, 0 takes one step per frame. '=' and '-' double
+        # and halve it, 'f' runs the search to the end before drawing again
+        self.step_budget = 0
+        # Trace sink handed to every Agent, see tracing.py
+        self.sink = sink
+        # Heuristic and weight for A* and ARA*, see planner.HEURISTICS
+        self.heuristic = "manhattan"
+        self.heuristic_weight = 1
+        # SearchStats of the last search that finished or failed, stepped or solved
+        self.stats = None
         self.quit = False
         self.type = "dfs"
         self.new_grid()
-    def new_grid(self):
-        self.grid = Grid(self)
-        self.agent = Agent(self.grid, self.grid.start, self.grid.goal, self.type)
-        self.grid.random()
+    # Loading a map that fails raises before anything is replaced, so the old grid stays up
+    def new_grid(self, path=None):
+        grid = Grid(self)
+        if path is None:
+            grid.random()
+        else:
+            grid.load(path)
         self.run = False
+        self.grid = grid
+        self.agent = Agent(self.grid, self.grid.start, self.grid.goal, self.type, self.sink)
+        self.restart()
+    # Starts the selected search over with the selected heuristic and weight
+    def restart(self):
+        self.run = False
+        self.agent.heuristic = self.heuristic
+        self.agent.heuristic_weight = self.heuristic_weight
+        self.grid.clear_path()
+        self.agent.new_plan(self.type)
     def loop(self):
         while True:
             self.draw()
             self.clock.tick(60)
             self.mpos = pygame.mouse.get_pos()
+            self.grid.paint(self.mpos)
             if self.run:
+                self.advance(self.step_budget)
+            elif self.agent.repair:
+                # Puddles were painted over a finished incremental plan, repair it right away
+                self.agent.repair = False
+                self.grid.clear_path()
+                self.agent.new_plan(self.type)
+                self.agent.make_step()
                 if self.agent.finished:
                     self.agent.show_result()
-                    self.run = False
-                elif self.agent.failed:
-                    self.run = False
-                else:
-                    self.agent.make_step()
             for event in pygame.event.get():
                 if event.type == QUIT:
-                    pygame.quit()
-                    sys.exit()
+                    self.exit()
                 if event.type == KEYDOWN:
                     if event.key == K_ESCAPE:
-                        pygame.quit()
-                        sys.exit()
+                        self.exit()
                     if event.key == K_RETURN:
                         self.run = not self.run
+                    if event.key == K_SPACE:
+                        self.solve()
                     if event.key == K_c:
                         self.new_grid()
-                    if event.key == K_1:
-                        self.grid.clear_path()
-                        self.type = "dfs"
-                        self.agent.new_plan(self.type)
-                    if event.key == K_2:
-                        self.grid.clear_path()
-                        self.type = "bfs"
-                        self.agent.new_plan(self.type)
-                    if event.key == K_3:
-                        self.grid.clear_path()
-                        self.type = "ucs"
-                        self.agent.new_plan(self.type)
-                    if event.key == K_4:
+                    if event.key == K_d:
+                        self.dirty_rects = not self.dirty_rects
+                    if event.key == K_f:
+                        self.run = True
+                        self.advance(None)
+                    if event.key == K_b:
+                        self.solve_batch()
+                    if event.key == K_s:
+                        self.grid.save(MAP_FILE)
+                        print("Saved the map to " + MAP_FILE)
+                    if event.key == K_o:
+                        try:
+                            self.new_grid(MAP_FILE)
+                        except (IOError, OSError, ValueError) as error:
+                            print("Could not load the map: " + str(error))
+                    if event.key == K_l:
+                        landmarks = self.grid.precompute_landmarks()
+                        print("Landmarks at " + str(landmarks.landmarks))
+                    if event.key == K_EQUALS:
+                        self.step_budget = max(1, self.step_budget*2)
+                        print("Stepping for " + str(self.step_budget) + " ms per frame")
+                    if event.key == K_MINUS:
+                        self.step_budget //= 2
+                        print("Stepping for " + str(self.step_budget) + " ms per frame")
+                    if event.key == K_w:
+                        self.heuristic_weight = WEIGHTS[(WEIGHTS.index(self.heuristic_weight) + 1) % len(WEIGHTS)]
+                        print("Heuristic weight " + str(self.heuristic_weight))
+                        self.restart()
+                    if event.key == K_e:
+                        self.heuristic = HEURISTIC_NAMES[(HEURISTIC_NAMES.index(self.heuristic) + 1) % len(HEURISTIC_NAMES)]
+                        print("Heuristic " + self.heuristic)
+                        self.restart()
+                    if event.key in PLAN_KEYS:
                         self.grid.clear_path()
-                        self.type = "astar"
+                        self.type = PLAN_KEYS[event.key]
                         self.agent.new_plan(self.type)
+    def exit(self):
+        if self.sink is not None:
+            self.sink.close()
+        pygame.quit()
+        sys.exit()
+    # Steps the search until budget milliseconds have passed, at least one step per call, or until it ends
+    # if budget is None. Events are pumped now and then so the window stays responsive
+    def advance(self, budget):
+        deadline = None if budget is None else pygame.time.get_ticks() + budget
+        steps = 0
+        while True:
+            if self.agent.finished:
+                self.agent.show_result()
+                self.run = False
+                self.show_stats(self.agent.stats)
+                self.show_cache_stats()
+                return
+            elif self.agent.failed:
+                self.run = False
+                self.show_stats(self.agent.stats)
+                return
+            self.agent.make_step()
+            steps += 1
+            if deadline is not None and pygame.time.get_ticks() >= deadline:
+                return
+            if steps % 1000 == 0:
+                pygame.event.pump()
+    # Runs the selected search headlessly in one go and only draws the path it found
+    def solve(self):
+        self.grid.clear_path()
+        self.agent.new_plan(self.type)
+        # The agent's type, JPS falls back to A* on maps with grass and the options are the A* ones then
+        result = self.grid.cache.plan(self.grid.map, self.grid.start, self.grid.goal, self.agent.type,
+                                      **self.agent.plan_options())
+        self.show_stats(result.stats)
+        if not result.found():
+            print("No path")
+            return
+        for pos in result.path[:-1]:
+            self.grid.map.mark(self.grid.map.in_path, self.grid.map.index(pos), 1)
+        print("Cost: " + str(result.cost) + ", expanded: " + str(result.expanded))
+    # Plans from BATCH_AGENTS random open cells to the goal in one batch and draws every path
+    def solve_batch(self):
+        self.grid.clear_path()
+        self.agent.new_plan(self.type)
+        gmap = self.grid.map
+        cells = [index for index in range(gmap.size) if not gmap.puddle[index]]
+        starts = [gmap.pos(index) for index in random.sample(cells, min(BATCH_AGENTS, len(cells)))]
+        batch = self.grid.plan_batch([(start, self.grid.goal) for start in starts], self.agent.type,
+                                     **self.agent.plan_options())
+        for result in batch.results:
+            for pos in result.path[:-1]:
+                gmap.mark(gmap.in_path, gmap.index(pos), 1)
+        metrics = batch.metrics()
+        print("%d of %d agents routed in %.1f ms, %.0f plans/s, %d expanded" % (metrics["found"],
+            metrics["queries"], 1000*metrics["seconds"], metrics["queries_per_second"], metrics["expanded"]))
+    def show_stats(self, stats):
+        self.stats = stats
+        print(self.type + ": " + stats.report())
+    def show_cache_stats(self):
+        stats = self.grid.cache.stats()
+        pygame.display.set_caption("Grid World - cache hits: %d, misses: %d" % (stats["hits"], stats["misses"]))
     def blitInfo(self):
-        line1 = self.font.render("Press Enter to find path or pause, press 'c' to clear board", 1, WHITE)
-        line2 = self.font.render("Press 1 for DFS, 2 for BFS, 3 for UCS, 4 for A*", 1, WHITE)
+        line1 = self.font.render("Enter run/pause, space solve, 'c' clear, 'h' HPA*, 'd' redraw", 1, WHITE)
+        line2 = self.font.render("1 DFS 2 BFS 3 UCS 4 A* 5 Dial 6 JPS 7 LPA* 8/9/0 Bi-BFS/UCS/A*", 1, WHITE)
         self.screen.blit(line1, (5, 5))
         self.screen.blit(line2, (5, 20))
     def draw(self):
+        if self.dirty_rects and not self.grid.map.redraw:
+            pygame.display.update(self.grid.update_dirty())
+            return
         self.screen.fill(0)
         self.grid.update()
         self.blitInfo()
@@ -90,88 +219,110 @@ class Grid:
         self.game = game
         self.width = int(self.game.screen_res[0]/15)
         self.height = int((self.game.screen_res[1]/15)-3)
-        self.nodes = {(i, j):Node(self, (i+3, j)) for i in range(self.height) for j in range(self.width)}
-        self.row_range = self.width-3
-        self.col_range = self.height+3
+        # Every per cell flag lives in a byte array in the GridMap, shared by the planners, the Agent and
+        # the drawing code, instead of in one object and surface per cell
+        self.map = GridMap(self.height, self.width)
+        # Results of earlier plans, keyed on the map version so painting invalidates them
+        self.cache = PathCache()
         self.start = (5,3)
         self.goal = (self.height-3, self.width-5)
     def random(self):
-        for node in self.nodes.values():
-            node.random_puddle()
-            node.random_grass()
+        size = self.map.size
+        puddle = bytearray(0 if random.randint(0,10) else 1 for i in range(size))
+        for pos in (self.start, self.goal):
+            puddle[self.map.index(pos)] = 0
+        grass = bytearray(0 if random.randint(0,3) or puddle[i] else 1 for i in range(size))
+        self.map.puddle[:] = puddle
+        self.map.grass[:] = grass
+        self.map.changed_all()
+    def save(self, path):
+        save_map(path, self.map, self.start, self.goal)
+    # Maps of another size than the window can only be used headless, see mapfile.load_map
+    def load(self, path):
+        gmap, start, goal = load_map(path)
+        if (gmap.rows, gmap.cols) != (self.map.rows, self.map.cols):
+            raise ValueError("%s is %dx%d, the window fits %dx%d" % (path, gmap.rows, gmap.cols, self.map.rows, self.map.cols))
+        self.map.puddle[:] = gmap.puddle
+        self.map.grass[:] = gmap.grass
+        self.start = start
+        self.goal = goal
+        self.map.changed_all()
+    # Version of the map, bumped by random() and by every puddle painted or erased
+    @property
+    def version(self):
+        return self.map.version
+    # Left click paints a puddle on an empty cell and right click erases one, only while paused
+    def paint(self, mpos):
+        buttons = pygame.mouse.get_pressed()
+        if self.game.run or not (buttons[0] or buttons[2]):
+            return
+        pos = (mpos[1]//15 - 3, mpos[0]//15)
+        if not self.map.in_range(pos) or pos == self.start or pos == self.goal:
+            return
+        index = self.map.index(pos)
+        if buttons[0] and not self.map.grass[index] and not self.map.checked[index] \
+                and not self.map.frontier[index] and not self.map.in_path[index]:
+            self.map.set_puddle(index, True)
+        if buttons[2]:
+            self.map.set_puddle(index, False)
+    def color(self, index):
+        #The order of these lines is important
+        gmap = self.map
+        if gmap.puddle[index]:
+            return BLUE
+        elif index == gmap.index(self.start) or index == gmap.index(self.goal):
+            return YELLOW
+        elif gmap.in_path[index]:
+            return REDGREY if gmap.grass[index] else RED
+        elif gmap.frontier[index]:
+            return GREY
+        elif gmap.checked[index]:
+            return GREENGREY if gmap.grass[index] else DARKGREY
+        elif gmap.grass[index]:
+            return GREEN
+        return BLACK
     def update(self):
-        for node in self.nodes.values():
-            node.update()
-            node.draw(self.game.screen)
+        screen = self.game.screen
+        self.map.dirty.clear()
+        self.map.redraw = False
+        for index in range(self.map.size):
+            row, col = self.map.pos(index)
+            screen.fill(self.color(index), (col*15, (row+3)*15, 15, 15))
         for i in range(self.width):
             pygame.draw.line(self.game.screen, [100]*3, (15*i, 45), (15*i, 750))
         for i in range(self.height):
             pygame.draw.line(self.game.screen, [100]*3, (0, (15*i)+45), (750, (15*i)+45))
+    # Redraws only the cells marked dirty, with the grid lines on their top and left edges, and returns
+    # their rects for pygame.display.update
+    def update_dirty(self):
+        screen = self.game.screen
+        rects = []
+        for index in self.map.dirty:
+            row, col = self.map.pos(index)
+            x, y = col*15, (row+3)*15
+            rects.append(screen.fill(self.color(index), (x, y, 15, 15)))
+            pygame.draw.line(screen, [100]*3, (x, y), (x+14, y))
+            pygame.draw.line(screen, [100]*3, (x, y), (x, y+14))
+        self.map.dirty.clear()
+        return rects
+    # Distances from every cell to the goal, numpy is only needed if this is used
+    def distance_field(self, weighted=True):
+        from fields import DistanceField
+        return DistanceField(self.map, self.goal, weighted)
+    # Computes the ALT landmark tables for the map now instead of on the first A* with the alt heuristic,
+    # and keeps them in directory under the map's hash so the same layout loads them on later runs. The
+    # tables are reused by every plan until the map changes
+    def precompute_landmarks(self, directory=LANDMARK_DIR):
+        from heuristics import landmarks
+        return landmarks(self.map, directory)
+    # Plans many (start, goal) queries on this map at once, see batch.py
+    def plan_batch(self, queries, type="astar", processes=None, **options):
+        return plan_batch(self.map, queries, type, processes, **options)
     def clear_path(self):
-        for node in self.nodes.values():
-            if node.checked:
-                node.checked = False
-            if node.in_path:
-                node.in_path = False
-            if node.frontier:
-                node.frontier = False
-
-class Node():
-    def __init__(self, grid, pos):
-        self.grid = grid
-        self.game = self.grid.game
-        self.pos = pos
-        self.blit_pos = [self.pos[1]*15, self.pos[0]*15]
-        self.color = BLACK
-        self.image = pygame.Surface((15, 15))
-        self.rect = self.image.get_rect(topleft=self.blit_pos)
-        self.in_path = False
-        self.checked = False
-        self.frontier = False
-        self.puddle = False
-        self.grass = False
-        self.start = False
-        self.goal = False
-    def update(self):
-        #The order of these lines is important
-        if self.puddle:
-            self.color = BLUE
-        elif self.start or self.goal:
-            self.color = YELLOW
-        elif self.in_path:
-            self.color = RED
-            if self.grass:
-                self.color = REDGREY
-        elif self.frontier:
-            self.color = GREY
-        elif self.checked:
-            self.color = DARKGREY
-            if self.grass:
-                self.color = GREENGREY
-        elif self.grass:
-            self.color = GREEN
-        elif not self.game.run:
-            if pygame.mouse.get_pressed()[0] and self.rect.collidepoint(self.game.mpos):
-                self.puddle = True
-            if pygame.mouse.get_pressed()[2] and self.rect.collidepoint(self.game.mpos):
-                self.puddle = False
-        else:
-            self.color = BLACK
-    def random_puddle(self):
-        if not random.randint(0,10) and not self.goal and not self.start:
-            self.puddle = True
-    def random_grass(self):
-        if not random.randint(0,3) and not self.puddle:
-            self.grass = True
-    def cost(self):
-        if self.grass:
-            return 10
-        else:
-            return 1
-    def draw(self, screen):
-        self.image.fill(self.color)
-        screen.blit(self.image, self.rect)
+        self.map.clear_path()
 
 if __name__ == '__main__':
-    game = GridWorld()
+    # python gridworld.py trace.jsonl (or any other name for the binary format) records every search
+    sink = open_sink(sys.argv[1]) if len(sys.argv) > 1 else None
+    game = GridWorld(sink)
     game.loop()
@@ -0,0 +1,127 @@
+from __future__ import print_function
+# Heuristics read from precomputed distance tables, listed next to manhattan in planner.HEURISTICS,
+# which imports this module the first time one is used. Each one turns its tables into a plain list per
+# goal, so the search looks a value up instead of computing it. NumPy is only imported once one of them
+# is used.
+import hashlib
+import os
+import weakref
+from planner import MAX_COST, MIN_COST
+
+# Number of landmarks ALT picks
+LANDMARKS = 8
+
+class Landmarks:
+    # Distances from every cell to a few landmark cells as a (landmarks, cells) int32 array, -1 where a
+    # cell cannot reach a landmark. version is the map version they were computed or loaded for
+    def __init__(self, gmap, landmarks, tables):
+        self.gmap = gmap
+        self.version = gmap.version
+        self.landmarks = landmarks
+        self.tables = tables
+
+    # Lower bounds on the cost to goal for every cell, as a list indexed by flat index. For a landmark
+    # L, d(v, goal) >= d(v, L) - d(goal, L) and d(v, goal) >= d(L, goal) - d(L, v). Only distances to L
+    # are stored, but a reversed path pays for the cell it leaves instead of the one it enters, so
+    # d(L, v) = d(v, L) + cost(v) - cost(L). The best bound over all landmarks and Manhattan distance
+    # wins, near the goal Manhattan distance is often the better one
+    def heuristic(self, goal):
+        import numpy as np
+        from fields import UNREACHABLE
+        gmap = self.gmap
+        goalIndex = gmap.index(goal)
+        rows, cols = np.divmod(np.arange(gmap.size, dtype=np.int64), gmap.cols)
+        best = MIN_COST*(np.abs(rows - goal[0]) + np.abs(cols - goal[1]))
+        cost = np.where(np.frombuffer(bytes(gmap.grass), dtype=np.uint8), MAX_COST, 1)
+        for table in self.tables:
+            # A landmark the goal cannot reach tells nothing about the goal
+            if table[goalIndex] == UNREACHABLE:
+                continue
+            goalToLandmark = int(table[goalIndex])
+            toLandmark = table.astype(np.int64)
+            bound = np.maximum(toLandmark - goalToLandmark,
+                               goalToLandmark + cost[goalIndex] - toLandmark - cost)
+            np.maximum(best, np.where(table == UNREACHABLE, 0, bound), out=best)
+        return best.tolist()
+
+    def save(self, path):
+        import numpy as np
+        np.savez(path, landmarks=np.array(self.landmarks, dtype=np.int32).reshape(-1, 2), tables=self.tables)
+
+# Picks count landmarks far apart, each new one is the cell farthest from the ones picked so far
+def pick_landmarks(gmap, count=LANDMARKS):
+    import numpy as np
+    from fields import dijkstra, UNREACHABLE
+    landmarks = []
+    tables = []
+    first = gmap.puddle.find(b"\x00")
+    if first >= 0:
+        seed = dijkstra(gmap, gmap.pos(first)).ravel()
+        nearest = np.where(seed == UNREACHABLE, -1, seed).astype(np.int64)
+        for i in range(count):
+            landmark = int(np.argmax(nearest))
+            if nearest[landmark] <= 0 and landmarks:
+                break
+            table = dijkstra(gmap, gmap.pos(landmark)).ravel()
+            landmarks.append(gmap.pos(landmark))
+            tables.append(table)
+            # Cells that cannot reach a landmark never become one
+            nearest = np.where(table == UNREACHABLE, -1, np.minimum(nearest, table))
+    return Landmarks(gmap, landmarks, np.array(tables, dtype=np.int32).reshape(len(tables), gmap.size))
+
+def load_landmarks(gmap, path):
+    import numpy as np
+    with np.load(path) as data:
+        landmarks = [(int(row), int(col)) for row, col in data["landmarks"]]
+        tables = data["tables"]
+    return Landmarks(gmap, landmarks, tables)
+
+# Identifies the layout of a map, maps with the same hash have the same size, puddles and grass
+def map_hash(gmap):
+    digest = hashlib.sha1(("%d %d " % (gmap.rows, gmap.cols)).encode("ascii"))
+    digest.update(bytes(gmap.puddle))
+    digest.update(bytes(gmap.grass))
+    return digest.hexdigest()
+
+# The landmarks in use for each map, and the directory each map keeps them in on disk, if any
+_landmarks = weakref.WeakKeyDictionary()
+_directories = weakref.WeakKeyDictionary()
+
+# Landmarks for the map as it is now, computed once per map version. Once a map has been given a
+# directory, new tables are first looked for there under the hash of the layout, so a layout seen
+# before, by this run or an earlier one, is loaded instead of computed, and new tables are saved there
+def landmarks(gmap, directory=None, count=LANDMARKS):
+    if directory is not None:
+        _directories[gmap] = directory
+    found = _landmarks.get(gmap)
+    if found is not None and found.version == gmap.version:
+        return found
+    directory = _directories.get(gmap)
+    if directory is None:
+        found = pick_landmarks(gmap, count)
+    else:
+        path = os.path.join(directory, "%s-%d.npz" % (map_hash(gmap), count))
+        if os.path.exists(path):
+            found = load_landmarks(gmap, path)
+        else:
+            found = pick_landmarks(gmap, count)
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            found.save(path)
+    _landmarks[gmap] = found
+    return found
+
+# Makes tables computed elsewhere, e.g. in another process for a copy of this map, the ones in use
+def use_landmarks(gmap, landmarks, tables):
+    _landmarks[gmap] = Landmarks(gmap, landmarks, tables)
+
+def alt(gmap, goal):
+    return landmarks(gmap).heuristic(goal).__getitem__
+
+# The exact cost to the goal from every cell, one Dijkstra from the goal per query. Cells that cannot
+# reach the goal get more than any path costs
+def table(gmap, goal):
+    import numpy as np
+    from fields import dijkstra, UNREACHABLE
+    dist = dijkstra(gmap, goal).ravel()
+    return np.where(dist == UNREACHABLE, gmap.size*MAX_COST, dist).tolist().__getitem__
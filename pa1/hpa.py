@@ -0,0 +1,236 @@
+from __future__ import print_function
+# Hierarchical path-finding A* (Botea, Mueller and Schaeffer). The map is cut into square clusters,
+# the open cells facing each other across cluster borders become entrances, and the costs between
+# entrances of the same cluster are cached. A query searches this small abstract graph and then only
+# refines the abstract path inside the clusters it crosses. Paths are near optimal, not optimal.
+from heapq import heappush, heappop
+from planner import MAX_COST, Result
+
+INF = float("inf")
+
+# Runs of open border cells longer than this get an entrance at both ends instead of one in the middle
+LONG_ENTRANCE = 6
+
+class HPAStar:
+    def __init__(self, gmap, cluster=10):
+        self.gmap = gmap
+        self.cluster = cluster
+        self.clusterRows = (gmap.rows + cluster - 1) // cluster
+        self.clusterCols = (gmap.cols + cluster - 1) // cluster
+        # Entrance pairs across each border, keyed on the two cluster ids with the smaller first
+        self.borders = {}
+        # For each cluster, the cached costs between its entrances: node -> [(other node, cost)]
+        self.edges = {}
+        self.hits = 0
+        self.misses = 0
+        gmap.listeners.append(self.cell_changed)
+
+    # Stops following changes to the map
+    def close(self):
+        self.gmap.listeners.remove(self.cell_changed)
+
+    def cluster_of(self, index):
+        row, col = divmod(index, self.gmap.cols)
+        return (row // self.cluster) * self.clusterCols + col // self.cluster
+
+    def bounds(self, cluster):
+        row, col = divmod(cluster, self.clusterCols)
+        return (row*self.cluster, min((row+1)*self.cluster, self.gmap.rows),
+                col*self.cluster, min((col+1)*self.cluster, self.gmap.cols))
+
+    # Clusters sharing a border with cluster, right and below first
+    def adjacent(self, cluster):
+        row, col = divmod(cluster, self.clusterCols)
+        result = []
+        for dr, dc in ((0,1),(1,0),(0,-1),(-1,0)):
+            if 0 <= row+dr < self.clusterRows and 0 <= col+dc < self.clusterCols:
+                result.append((row+dr)*self.clusterCols + col+dc)
+        return result
+
+    # A changed cell can change the entrances on its cluster's borders and with them the entrance sets
+    # of the neighboring clusters, so all of those are dropped and rebuilt on the next query. None means
+    # the whole map was rewritten
+    def cell_changed(self, index):
+        if index is None:
+            self.borders = {}
+            self.edges = {}
+            return
+        cluster = self.cluster_of(index)
+        self.edges.pop(cluster, None)
+        for other in self.adjacent(cluster):
+            self.edges.pop(other, None)
+            self.borders.pop((min(cluster, other), max(cluster, other)), None)
+
+    # Pairs (cell in a, cell in b) of open cells facing each other across the border of a and b
+    def border(self, a, b):
+        key = (min(a, b), max(a, b))
+        if key in self.borders:
+            return self.borders[key]
+        a, b = key
+        gmap = self.gmap
+        top, bottom, left, right = self.bounds(a)
+        if a // self.clusterCols == b // self.clusterCols:
+            cells = [(row*gmap.cols + right-1, row*gmap.cols + right) for row in range(top, bottom)]
+        else:
+            cells = [((bottom-1)*gmap.cols + col, bottom*gmap.cols + col) for col in range(left, right)]
+        runs = []
+        run = []
+        for pair in cells:
+            if gmap.puddle[pair[0]] or gmap.puddle[pair[1]]:
+                if run:
+                    runs.append(run)
+                run = []
+            else:
+                run.append(pair)
+        if run:
+            runs.append(run)
+        # Grass makes some crossings ten times dearer than others, so each entrance uses the cheapest
+        # crossing in its part of the run, ties going to the one nearest the middle of that part
+        entrances = []
+        for run in runs:
+            if len(run) >= LONG_ENTRANCE:
+                parts = [run[:len(run)//2], run[len(run)//2:]]
+            else:
+                parts = [run]
+            for part in parts:
+                middle = (len(part) - 1) / 2.0
+                best = min(range(len(part)), key=lambda i: (gmap.cost(part[i][0]) + gmap.cost(part[i][1]), abs(i - middle)))
+                entrances.append(part[best])
+        self.borders[key] = entrances
+        return entrances
+
+    # Entrance cells on the cluster's side of its borders, each with the cells it leads to across them
+    def entrances(self, cluster):
+        result = {}
+        for other in self.adjacent(cluster):
+            for pair in self.border(cluster, other):
+                inside, outside = pair if self.cluster_of(pair[0]) == cluster else pair[::-1]
+                result.setdefault(inside, []).append(outside)
+        return result
+
+    # Dijkstra from source that never leaves cluster. Forward costs are paid for the cell being entered;
+    # with reverse the search runs toward source and pays for the cell being left, so the costs are the
+    # costs of reaching source instead
+    def search(self, cluster, source, reverse=False):
+        gmap = self.gmap
+        cols = gmap.cols
+        puddle = gmap.puddle
+        grass = gmap.grass
+        top, bottom, left, right = self.bounds(cluster)
+        costs = {source: 0}
+        previous = {}
+        frontier = [(0, source)]
+        expanded = 0
+        while frontier:
+            cost, current = heappop(frontier)
+            # Entries left behind when a node was pushed again with a lower cost
+            if cost > costs[current]:
+                continue
+            expanded += 1
+            row, col = divmod(current, cols)
+            step = MAX_COST if grass[current] else 1
+            for node, inside in ((current-1, col > left), (current-cols, row > top),
+                                 (current+1, col < right-1), (current+cols, row < bottom-1)):
+                if not inside or puddle[node]:
+                    continue
+                altCost = cost + (step if reverse else (MAX_COST if grass[node] else 1))
+                if altCost < costs.get(node, INF):
+                    costs[node] = altCost
+                    previous[node] = current
+                    heappush(frontier, (altCost, node))
+        return costs, previous, expanded
+
+    # Cached costs between the entrances of a cluster
+    def cluster_edges(self, cluster):
+        if cluster in self.edges:
+            self.hits += 1
+            return self.edges[cluster]
+        self.misses += 1
+        nodes = self.entrances(cluster)
+        edges = {}
+        for node, across in nodes.items():
+            costs = self.search(cluster, node)[0]
+            edges[node] = [(other, costs[other]) for other in nodes if other != node and other in costs]
+            edges[node].extend((outside, self.gmap.cost(outside)) for outside in across)
+        self.edges[cluster] = edges
+        return edges
+
+    # Builds the cache for every cluster up front instead of on first use
+    def precompute(self):
+        for cluster in range(self.clusterRows*self.clusterCols):
+            self.cluster_edges(cluster)
+
+    def plan(self, start, goal):
+        gmap = self.gmap
+        startIndex = gmap.index(start)
+        goalIndex = gmap.index(goal)
+        # No path ends on a puddle, like in the one-way planners
+        if gmap.puddle[goalIndex]:
+            return Result([], None, 0)
+        startCluster = self.cluster_of(startIndex)
+        goalCluster = self.cluster_of(goalIndex)
+        # Temporary edges from start to the entrances of its cluster and from the entrances of the goal's
+        # cluster to the goal
+        startCosts, startPrevious, expanded = self.search(startCluster, startIndex)
+        goalCosts, goalLinks, goalExpanded = self.search(goalCluster, goalIndex, reverse=True)
+        expanded += goalExpanded
+        startEdges = [(node, startCosts[node]) for node in self.entrances(startCluster) if node in startCosts]
+        if goalIndex in startCosts:
+            startEdges.append((goalIndex, startCosts[goalIndex]))
+
+        # A* over the abstract graph
+        goalRow, goalCol = goal
+        def heuristic(node):
+            row, col = divmod(node, gmap.cols)
+            return abs(row - goalRow) + abs(col - goalCol)
+        costs = {startIndex: 0}
+        previous = {}
+        closed = set()
+        frontier = [(heuristic(startIndex), startIndex)]
+        while frontier:
+            current = heappop(frontier)[1]
+            if current in closed:
+                continue
+            closed.add(current)
+            expanded += 1
+            if current == goalIndex:
+                break
+            successors = list(self.cluster_edges(self.cluster_of(current)).get(current, []))
+            if current == startIndex:
+                successors.extend(startEdges)
+            if current in goalCosts:
+                successors.append((goalIndex, goalCosts[current]))
+            for node, cost in successors:
+                altCost = costs[current] + cost
+                if node not in closed and altCost < costs.get(node, INF):
+                    costs[node] = altCost
+                    previous[node] = current
+                    heappush(frontier, (altCost + heuristic(node), node))
+        if goalIndex not in closed:
+            return Result([], None, expanded)
+
+        # Refine each abstract edge into cells, steps across a border are already single moves
+        points = [goalIndex]
+        while points[-1] != startIndex:
+            points.append(previous[points[-1]])
+        points.reverse()
+        path = [startIndex]
+        for a, b in zip(points, points[1:]):
+            if self.cluster_of(a) != self.cluster_of(b):
+                path.append(b)
+                continue
+            if a == startIndex:
+                links = startPrevious
+            else:
+                links = self.search(self.cluster_of(a), a)[1]
+            piece = [b]
+            while piece[-1] != a:
+                piece.append(links[piece[-1]])
+            path.extend(piece[-2::-1])
+        return Result([gmap.pos(i) for i in path], costs[goalIndex], expanded)
+
+def hpa(gmap, start, goal):
+    search = HPAStar(gmap)
+    result = search.plan(start, goal)
+    search.close()
+    return result
@@ -0,0 +1,120 @@
+from __future__ import print_function
+# Lifelong Planning A* (Koenig and Likhachev). The search tree is kept between calls to compute, so
+# when cells flip between puddle, grass and open only the part of the tree that depended on them is
+# repaired instead of searching the whole map again.
+from heapq import heappush, heappop
+from planner import Result
+
+INF = float("inf")
+
+class LPAStar:
+    def __init__(self, gmap, start, goal):
+        self.gmap = gmap
+        self.start = gmap.index(start)
+        self.goal = gmap.index(goal)
+        self.goalPos = goal
+        self.reset()
+        gmap.listeners.append(self.cell_changed)
+
+    def reset(self):
+        # g is the cost found so far, rhs the cost one step ahead of it, a node whose g and rhs differ
+        # is inconsistent and sits in the frontier
+        self.g = {}
+        self.rhs = {self.start: 0}
+        self.frontier = []
+        # Current key of each node in the frontier, heap entries with any other key are stale
+        self.keys = {}
+        self.push(self.start)
+
+    # Stops following changes to the map
+    def close(self):
+        self.gmap.listeners.remove(self.cell_changed)
+
+    def heuristic(self, node):
+        row, col = divmod(node, self.gmap.cols)
+        return abs(row - self.goalPos[0]) + abs(col - self.goalPos[1])
+
+    def key(self, node):
+        best = min(self.g.get(node, INF), self.rhs.get(node, INF))
+        return (best + self.heuristic(node), best)
+
+    def push(self, node):
+        key = self.key(node)
+        self.keys[node] = key
+        heappush(self.frontier, (key, node))
+
+    # Pops stale entries until the top of the heap is current
+    def top(self):
+        while self.frontier:
+            key, node = self.frontier[0]
+            if self.keys.get(node) == key:
+                return key, node
+            heappop(self.frontier)
+        return (INF, INF), None
+
+    # Recomputes rhs from the neighbors and puts the node in the frontier if it is inconsistent
+    def update_vertex(self, node):
+        gmap = self.gmap
+        if node != self.start:
+            best = INF
+            if not gmap.puddle[node]:
+                cost = gmap.cost(node)
+                for neighbor in gmap.neighbors(node):
+                    best = min(best, self.g.get(neighbor, INF) + cost)
+            self.rhs[node] = best
+        self.keys.pop(node, None)
+        if self.g.get(node, INF) != self.rhs.get(node, INF):
+            self.push(node)
+
+    # The cell's own cost changed and so did whether its neighbors can step through it. None means the
+    # whole map was rewritten, then the search starts over
+    def cell_changed(self, index):
+        if index is None:
+            self.reset()
+            return
+        self.update_vertex(index)
+        row, col = divmod(index, self.gmap.cols)
+        for dr, dc in ((0,-1),(-1,0),(0,1),(1,0)):
+            if self.gmap.in_range((row+dr, col+dc)):
+                self.update_vertex(index + dr*self.gmap.cols + dc)
+
+    # Expands inconsistent nodes until the goal is consistent, returns the path and how many nodes it
+    # took this call
+    def compute(self):
+        expanded = 0
+        while True:
+            key, node = self.top()
+            goalRhs = self.rhs.get(self.goal, INF)
+            if node is None or (key >= self.key(self.goal) and goalRhs == self.g.get(self.goal, INF)):
+                break
+            heappop(self.frontier)
+            del self.keys[node]
+            expanded += 1
+            if self.g.get(node, INF) > self.rhs[node]:
+                self.g[node] = self.rhs[node]
+            else:
+                self.g[node] = INF
+                self.update_vertex(node)
+            for neighbor in self.gmap.neighbors(node):
+                self.update_vertex(neighbor)
+        return self.result(expanded)
+
+    # Walks back from the goal through the cheapest neighbors
+    def result(self, expanded):
+        gmap = self.gmap
+        cost = self.g.get(self.goal, INF)
+        if cost == INF:
+            return Result([], None, expanded)
+        path = [self.goal]
+        current = self.goal
+        while current != self.start:
+            current = min(gmap.neighbors(current), key=lambda node: self.g.get(node, INF))
+            path.append(current)
+        path.reverse()
+        return Result([gmap.pos(i) for i in path], int(cost), expanded)
+
+def lpa(gmap, start, goal):
+    search = LPAStar(gmap, start, goal)
+    result = search.compute()
+    search.close()
+    return result
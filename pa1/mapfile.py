@@ -0,0 +1,70 @@
+from __future__ import print_function
+# Binary map files. A fixed header holds the size, start and goal, followed by the puddle and grass
+# flags packed eight cells to a byte, most significant bit first, in flat index order. Loading maps the
+# file into memory and unpacks each plane in one go, so even very large maps load without parsing
+# anything cell by cell.
+import mmap
+import struct
+from planner import GridMap
+
+MAGIC = b"GMAP"
+FORMAT_VERSION = 1
+# magic, format version, rows, cols, start row, start col, goal row, goal col
+HEADER = struct.Struct("<4sHIIiiii")
+
+# UNPACK[byte] is the eight flags of a packed byte, PACK turns them back
+UNPACK = [bytes(bytearray((byte >> (7 - bit)) & 1 for bit in range(8))) for byte in range(256)]
+PACK = dict((flags, byte) for byte, flags in enumerate(UNPACK))
+
+def plane_size(cells):
+    return (cells + 7) // 8
+
+# Both use numpy when it is installed and a lookup table per byte when not
+def pack(flags):
+    try:
+        import numpy as np
+    except ImportError:
+        flags = bytes(flags) + bytes(bytearray(-len(flags) % 8))
+        return bytearray(PACK[flags[i:i+8]] for i in range(0, len(flags), 8))
+    return bytearray(np.packbits(np.frombuffer(bytes(flags), dtype=np.uint8)).tobytes())
+
+def unpack(packed, cells):
+    try:
+        import numpy as np
+    except ImportError:
+        return bytearray(b"".join([UNPACK[byte] for byte in bytearray(packed)])[:cells])
+    return bytearray(np.unpackbits(np.frombuffer(packed, dtype=np.uint8))[:cells].tobytes())
+
+def save_map(path, gmap, start, goal):
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, gmap.rows, gmap.cols, start[0], start[1], goal[0], goal[1]))
+        f.write(pack(gmap.puddle))
+        f.write(pack(gmap.grass))
+
+# Returns (gmap, start, goal)
+def load_map(path):
+    with open(path, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if len(data) < HEADER.size:
+                raise ValueError(path + " is not a map file")
+            magic, version, rows, cols, startRow, startCol, goalRow, goalCol = HEADER.unpack_from(data, 0)
+            if magic != MAGIC:
+                raise ValueError(path + " is not a map file")
+            if version != FORMAT_VERSION:
+                raise ValueError(path + " has map format version %d, expected %d" % (version, FORMAT_VERSION))
+            # Checked before the map is built, a bad header could otherwise ask for any amount of memory
+            size = plane_size(rows*cols)
+            if len(data) < HEADER.size + 2*size:
+                raise ValueError(path + " is truncated")
+            start = (startRow, startCol)
+            goal = (goalRow, goalCol)
+            for pos in (start, goal):
+                if not (0 <= pos[0] < rows and 0 <= pos[1] < cols):
+                    raise ValueError("%s has %s outside its %dx%d map" % (path, pos, rows, cols))
+            gmap = GridMap(rows, cols)
+            gmap.puddle[:] = unpack(data[HEADER.size:HEADER.size + size], gmap.size)
+            gmap.grass[:] = unpack(data[HEADER.size + size:HEADER.size + 2*size], gmap.size)
+        finally:
+            data.close()
+    return gmap, start, goal
@@ -2,253 +2,151 @@ from __future__ import print_function
 #Use priority queues from Python libraries, don't waste time implementing your own
 from heapq import *
 from math import sqrt
+from copy import copy
+from timeit import default_timer as timer
+from planner import Result, SearchStats, PathCache, STEPPERS, search_steps, plan
+from incremental import LPAStar
+from hpa import HPAStar
 
 ACTIONS = [(0,-1),(-1,0),(0,1),(1,0)]
 
 class Agent:
-    def __init__(self, grid, start, goal, type):
+    def __init__(self, grid, start, goal, type, sink=None):
         self.grid = grid
+        # Receives every expansion and frontier push, see tracing.py. None records nothing
+        self.sink = sink
         self.previous = {}
-        self.explored = []
         self.start = start 
-        self.grid.nodes[start].start = True
         self.goal = goal
-        self.grid.nodes[goal].goal = True
+        # The incremental search and the hierarchical cluster cache are kept across plans and follow every
+        # change to the map
+        self.lpa = None
+        self.hpa = None
+        self.repair = False
+        # Heuristic A* and ARA* use, by name in planner.HEURISTICS, and the weight A* puts on it. ARA* starts
+        # from this weight when it is above 1
+        self.heuristic = "manhattan"
+        self.heuristic_weight = 1
+        self.grid.map.listeners.append(self.map_changed)
         self.new_plan(type)
-        self.iteration = 0
     def new_plan(self, type):
         self.finished = False
         self.failed = False
+        # Number of steps taken on this plan
+        self.iteration = 0
+        # Counters for this plan, seconds only counts time spent in make_step and not in drawing
+        self.stats = SearchStats()
+        # Jump point search needs every open cell to cost the same
+        if type == "jps" and 1 in self.grid.map.grass:
+            print("Grass on the map, using A* instead of JPS")
+            type = "astar"
         self.type = type
-        if self.type == "dfs" :
-            self.frontier = [self.start]
-            self.explored = []
-        elif self.type == "bfs":
-            self.frontier = [self.start]
-            self.explored  = []
-            pass
-        elif self.type == "ucs":
-            self.frontier = []
-            # Add self.start to frontier with priority of 0
-            heappush(self.frontier, (0, self.start))
-            self.explored = []
-            # Set G cost of start to 0, chose to include a separate array because wanted to have a way to easily get the path costs of the children nodes 
-            # when relaxing edges
-            self.costArr = {self.start: 0}
-            pass
-        elif self.type == "astar":
-            self.frontier = []
-            # Add self.start to frontier with priority of 0, store cost 
-            heappush(self.frontier, (self.heuristic_manhattan(self.start, self.goal), self.start))
-            self.explored = []
-            # Set G cost of start to 0
-            self.costArr = {self.start: 0}
-            pass
+        # DFS, BFS, UCS, Dial, A* and JPS are the planner searches, run one expansion per step
+        if self.type in STEPPERS:
+            options = self.plan_options()
+            options["sink"] = self.sink
+            self.steps = search_steps(self.grid.map, self.start, self.goal, self.type, **options)
+        elif self.type == "lpa":
+            if self.lpa is None:
+                self.lpa = LPAStar(self.grid.map, self.start, self.goal)
+        elif self.type == "hpa":
+            if self.hpa is None:
+                self.hpa = HPAStar(self.grid.map)
+    # Flags a finished incremental plan for repair when a cell changes under it
+    def map_changed(self, index):
+        if self.type == "lpa" and (self.finished or self.failed):
+            self.repair = True
     def show_result(self):
         current = self.goal
         while not current == self.start:
             current = self.previous[current]
-            self.grid.nodes[current].in_path = True #This turns the color of the node to red
+            self.grid.map.mark(self.grid.map.in_path, self.grid.map.index(current), 1) #This turns the color of the node to red
+    # Options passed to the planner for the current type, they are part of the cache key too
+    def plan_options(self):
+        if self.type == "astar":
+            return {"heuristic": self.heuristic, "heuristic_weight": self.heuristic_weight}
+        if self.type == "ara":
+            if self.heuristic_weight > 1:
+                return {"heuristic": self.heuristic, "weight": self.heuristic_weight}
+            return {"heuristic": self.heuristic}
+        return {}
+    # Key of the current plan in the grid's path cache
+    def cache_key(self):
+        return PathCache.key(self.start, self.goal, self.type, self.grid.map.version, self.plan_options())
+    # The finished or failed plan as a Result
+    def result(self):
+        if self.failed:
+            return Result([], None, self.stats.expanded, self.stats)
+        path = [self.goal]
+        while path[-1] != self.start:
+            path.append(self.previous[path[-1]])
+        path.reverse()
+        cost = sum(self.grid.map.cost(self.grid.map.index(node)) for node in path[1:])
+        return Result(path, cost, self.stats.expanded, self.stats)
     def make_step(self):
-        if self.type == "dfs":
-            self.dfs_step()
-        elif self.type == "bfs":
-            self.bfs_step()
-        elif self.type == "ucs":
-            self.ucs_step()
-        elif self.type == "astar":
-            self.astar_step()
-    def dfs_step(self):
-        # If frontier is empty then there is no path so return failed
-        if not self.frontier:
-            self.failed = True
-            print("no path")
-            return
-        current = self.frontier.pop()
-        print("current node: ", current)
-        # Mark current node as checked and remove from frontier
-        self.grid.nodes[current].checked = True
-        self.grid.nodes[current].frontier = False
-        self.explored.append(current)
-        children = [(current[0]+a[0], current[1]+a[1]) for a in ACTIONS]
-        # Go through each node in children
-        for node in children:
-            # If node has been explored or is in the frontier skip the node
-            if node in self.explored or node in self.frontier:
-                print("explored before: ", node)
-                continue
-            # Check if node is in the range of the grid
-            if node[0] in range(self.grid.row_range) and node[1] in range(self.grid.col_range):
-                # If node is a puddle then skip
-                if self.grid.nodes[node].puddle:
-                    print("puddle at: ", node)
-                else:
-                    # Set the previous of node to current, if node is goal then return finished
-                    self.previous[node] = current
-                    if node == self.goal:
-                        self.finished = True
-                        return
-                    else:
-                        # Add node to frontier
-                        self.frontier.append(node)
-                        # Set node frontier flag to true
-                        self.grid.nodes[node].frontier = True
-            else:
-                print("out of range: ", node)
+        # A plan already made on this version of the map is answered from the cache
+        if self.iteration == 0:
+            cached = self.grid.cache.get(self.cache_key())
+            if cached is not None:
+                print("Found in cache")
+                self.follow(cached)
+                return
+        self.iteration += 1
+        began = timer()
+        self.search_step()
+        self.stats.seconds += timer() - began
+        if self.finished or self.failed:
+            self.grid.cache.put(self.cache_key(), self.result())
+    def search_step(self):
+        if self.type in STEPPERS:
+            self.planner_step()
+        elif self.type == "lpa":
+            self.lpa_step()
+        elif self.type == "hpa":
+            self.hpa_step()
+        else:
+            self.plan_step()
 
-    def bfs_step(self):
-        # If frontier is empty then there is no path so return failed
-        if not self.frontier:
-            self.failed = True
-            print("No path")
-            return
-        current = self.frontier.pop()
-        print("current node: ", current)
-        # Mark current node as checked and remove from frontier
-        self.grid.nodes[current].checked = True
-        self.grid.nodes[current].frontier = False
-        self.explored.append(current)
-        children = [(current[0]+a[0], current[1]+a[1]) for a in ACTIONS]
+    # Takes one expansion of the planner search and shows it, the last one hands over the result
+    def planner_step(self):
+        expanded, generated, result = next(self.steps)
+        gmap = self.grid.map
+        if expanded is not None:
+            # Mark current node as checked and remove from frontier
+            gmap.mark(gmap.checked, expanded, 1)
+            gmap.mark(gmap.frontier, expanded, 0)
+        for index in generated:
+            gmap.mark(gmap.frontier, index, 1)
+        if result is not None:
+            self.follow(result)
 
-        for node in children:
-            # If node has been explored or is in the frontier skip the node
-            if node in self.explored or node in self.frontier:
-                print("expored before: ", node)
-                continue
-            # Check if node is in the range of the grid
-            if node[0] in range(self.grid.row_range) and node[1] in range(self.grid.col_range):
-                # If node is a puddle then skip
-                if self.grid.nodes[node].puddle:
-                    print("puddle at: ", node)
-                else:
-                    # Set the previous of node to current, if node is goal then return finished, else enqueue to frontier
-                    self.previous[node] = current
-                    if node == self.goal:
-                        self.finished = True
-                        return
-                    else:
-                        self.frontier = [node] + self.frontier
-                        self.grid.nodes[node].frontier = True
-            else:
-                print("out of range: ", node)
-                    
-    def ucs_step(self):
-        # If frontier is empty then there is no path so return failed
-        if not self.frontier: 
-            self.failed = True
-            print("No path")
-            return
-        # Pop node from frontier with lowest G cost
-        nodeVal = heappop(self.frontier)
-        current = nodeVal[1]
-        # Get G cost for the current node
-        currentCost = self.costArr[current]
-        # Mark node as in frontier and is checked
-        self.grid.nodes[current].frontier = False
-        self.grid.nodes[current].checked = True
-        # If node is goal print cost for path and return true
-        if current == self.goal:
-            print("Current cost is: " + str(currentCost))
-            self.finished = True
-            return
+    # Runs LPA* until the goal is consistent again, after the first call this only repairs the part of the
+    # search affected by cells that changed since
+    def lpa_step(self):
+        self.follow(self.lpa.compute())
+
+    # Searches the cluster graph, only clusters changed since the last plan get their costs recomputed
+    def hpa_step(self):
+        self.follow(self.hpa.plan(self.start, self.goal))
 
-        # Add node to explored
-        self.explored.append(current)
-        children = [(current[0]+a[0], current[1]+a[1]) for a in ACTIONS]
-        # For each child of node 
-        for node in children:
-            # If node is in range of the grid
-            if node[0] in range(self.grid.row_range) and node[1] in range(self.grid.col_range):
-                # If node is a puddle then skip
-                if self.grid.nodes[node].puddle:
-                    print("puddle at: ", node)
-                else:
-                    # Get G_temp and store in altCost
-                    altCost = currentCost + self.grid.nodes[node].cost()
-                    # If not has not been explored and is not in frontier, then add node in frontier, this check prevents adding duplicates to frontier
-                    if node not in self.explored and not self.grid.nodes[node].frontier:
-                        # Add to frontier with altCost priority, store altCost node in G array, set current to previous of node, and set frontier to true
-                        heappush(self.frontier, (altCost, node))
-                        self.costArr[node] = altCost
-                        self.previous[node] = current
-                        self.grid.nodes[node].frontier = True 
-                    # If node is in frontier and the cost you found is cheaper than cost previously found, relax that edge
-                    elif self.grid.nodes[node].frontier and self.costArr[node] > altCost:
-                        i = 0
-                        # Find node and remove it from frontier
-                        while i < len(self.frontier):
-                            if(self.frontier[i][1] == node):
-                                self.frontier[i] = self.frontier[-1]
-                                self.frontier.pop()
-                                break
-                            i += 1
-                        # Heapify frontier and add node to frontier with priority of altCost, store new cost in G array, and update previous of node to current
-                        heapify(self.frontier)
-                        heappush(self.frontier, (altCost, node))
-                        self.costArr[node] = altCost
-                        self.previous[node] = current
-            else:
-                print("out of range: ", node)
-        
-    def astar_step(self):
-        heuristic_weight = 10
-        # If frontier is empty then there is no path so return failed
-        if not self.frontier: 
+    # Searches that only exist in planner, like the bidirectional ones and ARA*, run to completion in one step
+    def plan_step(self):
+        self.follow(plan(self.grid.map, self.start, self.goal, self.type, **self.plan_options()))
+
+    # Copies a finished headless search into previous so show_result can draw it
+    def follow(self, result):
+        print("Expanded " + str(result.expanded) + " nodes")
+        # Counters of the search that produced the result, the time spent here is added by make_step
+        seconds = self.stats.seconds
+        self.stats = copy(result.stats)
+        self.stats.seconds = seconds
+        if not result.found():
             self.failed = True
             print("No path")
             return
-        # Pop node from frontier with lowest F cost, where F = G + H
-        nodeVal = heappop(self.frontier)
-        current = nodeVal[1]
-        # Retrieve G cost for current
-        currentCost = self.costArr[current]
-        # Mark node as being in frontier and mark it as checked
-        self.grid.nodes[current].frontier = False
-        self.grid.nodes[current].checked = True
-        # If node is goal print cost for path and return true
-        if current == self.goal:
-            print("Current cost is: " + str(currentCost))
-            self.finished = True
-            return
-
-        # Add node to explored
-        self.explored.append(current)
-        children = [(current[0]+a[0], current[1]+a[1]) for a in ACTIONS]
-        for node in children:
-            # If node is in range of the grid
-            if node[0] in range(self.grid.row_range) and node[1] in range(self.grid.col_range):
-                # If node is a puddle then skip
-                if self.grid.nodes[node].puddle:
-                    print("puddle at: ", node)
-                else:
-                    # Get G_temp and store in altCost
-                    altCost = currentCost + self.grid.nodes[node].cost()
-                    # If not has not been explored and is not in frontier, then add node in frontier, this check prevents adding duplicates to frontier
-                    if node not in self.explored and not self.grid.nodes[node].frontier:
-                        # Add to frontier with F = G + H priority, store altCost node in G array, set current to previous of node, and set frontier to true
-                        heappush(self.frontier, (altCost + heuristic_weight*self.heuristic_manhattan(node, self.goal), node))
-                        self.costArr[node] = altCost
-                        self.previous[node] = current
-                        self.grid.nodes[node].frontier = True
-                    # If node is in frontier and the cost you found is cheaper than cost previously found, relax that edge
-                    elif self.grid.nodes[node].frontier and self.costArr[node] > altCost:
-                        i = 0
-                        # Find node and remove it from frontier
-                        while i < len(self.frontier):
-                            if(self.frontier[i][1] == node):
-                                self.frontier[i] = self.frontier[-1]
-                                self.frontier.pop()
-                                break
-                            i += 1
-                        # Heapify frontier and add node to frontier with priority of G + H, store new cost in G array, and update previous of node to current
-                        heapify(self.frontier)
-                        heappush(self.frontier, (altCost + heuristic_weight*self.heuristic_manhattan(node, self.goal), node))
-                        self.costArr[node] = altCost
-                        self.previous[node] = current
-            else:
-                print("out of range: ", node)
-
-    # Heuristic function implemented using manhattan distance, returning the sum of the absolute differences of the x and y coordinates
-    def heuristic_manhattan(self, node, goal):
-        return abs(node[0] - goal[0]) + abs(node[1] - goal[1])
-        
+        if result.stats.bound is not None and result.stats.bound > 1:
+            print("Within " + str(round(result.stats.bound, 2)) + " times the optimal cost")
+        for parent, node in zip(result.path, result.path[1:]):
+            self.previous[node] = parent
+        print("Current cost is: " + str(result.cost))
+        self.finished = True
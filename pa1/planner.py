@@ -0,0 +1,820 @@
+from __future__ import print_function
+# Headless searches. Nothing in here touches pygame, so a whole search runs to completion in one call
+# on a compact grid. The searches methods.Agent draws step by step are the same code, run one expansion
+# per frame through search_steps.
+from heapq import heappush, heappop, heapify
+from collections import deque, OrderedDict
+from copy import copy
+from timeit import default_timer as timer
+
+ACTIONS = [(0,-1),(-1,0),(0,1),(1,0)]
+INF = float("inf")
+# Highest and lowest values GridMap.cost can return
+MAX_COST = 10
+MIN_COST = 1
+
+class GridMap:
+    # Compact grid: one byte per cell for the puddle and grass flags, cells addressed by a flat
+    # index row*cols + col
+    def __init__(self, rows, cols):
+        self.rows = rows
+        self.cols = cols
+        self.size = rows*cols
+        self.puddle = bytearray(self.size)
+        self.grass = bytearray(self.size)
+        # Drawing state of the step by step searches in methods.Agent, the headless planners ignore these
+        self.checked = bytearray(self.size)
+        self.frontier = bytearray(self.size)
+        self.in_path = bytearray(self.size)
+        # Cells that may look different since the renderer last drew them, redraw means all of them
+        self.dirty = set()
+        self.redraw = True
+        # Called with the flat index of every cell whose puddle or grass flag changes through set_puddle
+        # or set_grass, incremental planners use this to repair their search
+        self.listeners = []
+        # Bumped on every change to the map, anything computed from it can be keyed on this
+        self.version = 0
+    def bump(self):
+        self.version += 1
+    def set_puddle(self, index, value):
+        value = 1 if value else 0
+        if self.puddle[index] != value:
+            self.puddle[index] = value
+            self.changed(index)
+    def set_grass(self, index, value):
+        value = 1 if value else 0
+        if self.grass[index] != value:
+            self.grass[index] = value
+            self.changed(index)
+    def changed(self, index):
+        self.bump()
+        if index is None:
+            self.redraw = True
+        else:
+            self.dirty.add(index)
+        for listener in self.listeners:
+            listener(index)
+    # After the flags were rewritten in bulk, listeners get None instead of a cell index
+    def changed_all(self):
+        self.changed(None)
+    # Sets one of the drawing flags and remembers the cell has to be redrawn
+    def mark(self, flags, index, value):
+        flags[index] = value
+        self.dirty.add(index)
+    def clear_path(self):
+        empty = bytes(self.size)
+        self.checked[:] = empty
+        self.frontier[:] = empty
+        self.in_path[:] = empty
+        self.redraw = True
+    def index(self, pos):
+        return pos[0]*self.cols + pos[1]
+    def pos(self, index):
+        return divmod(index, self.cols)
+    def in_range(self, pos):
+        return 0 <= pos[0] < self.rows and 0 <= pos[1] < self.cols
+    def cost(self, index):
+        if self.grass[index]:
+            return MAX_COST
+        else:
+            return 1
+    # Returns the flat indices of the open cells next to index, in the same order as ACTIONS
+    def neighbors(self, index):
+        cols = self.cols
+        puddle = self.puddle
+        row, col = divmod(index, cols)
+        result = []
+        if col > 0 and not puddle[index-1]:
+            result.append(index-1)
+        if row > 0 and not puddle[index-cols]:
+            result.append(index-cols)
+        if col < cols-1 and not puddle[index+1]:
+            result.append(index+1)
+        if row < self.rows-1 and not puddle[index+cols]:
+            result.append(index+cols)
+        return result
+
+class HeapQueue:
+    # Binary heap frontier, ties on priority are broken by the item itself
+    def __init__(self):
+        self.heap = []
+    def __len__(self):
+        return len(self.heap)
+    def push(self, priority, item):
+        heappush(self.heap, (priority, item))
+    def pop(self):
+        return heappop(self.heap)
+
+class BucketQueue:
+    # Dial's frontier. Priorities are integer G costs and an item is never pushed more than MAX_COST
+    # above the last popped priority, so a ring of MAX_COST+1 buckets gives O(1) push and pop
+    def __init__(self):
+        self.buckets = [[] for i in range(MAX_COST+1)]
+        self.current = 0
+        self.count = 0
+    def __len__(self):
+        return self.count
+    def push(self, priority, item):
+        self.buckets[priority % (MAX_COST+1)].append(item)
+        self.count += 1
+    def pop(self):
+        bucket = self.buckets[self.current % (MAX_COST+1)]
+        while not bucket:
+            self.current += 1
+            bucket = self.buckets[self.current % (MAX_COST+1)]
+        self.count -= 1
+        return self.current, bucket.pop()
+
+class SearchStats:
+    # Counters for one search. generated counts pushes onto the frontier, relaxations the pushes that
+    # lowered the cost of a node already in it, and seconds the wall time spent searching. Planners
+    # that only count expansions leave the rest at zero
+    def __init__(self):
+        self.expanded = 0
+        self.generated = 0
+        self.peak_frontier = 0
+        self.relaxations = 0
+        self.seconds = 0.0
+        self.length = 0
+        self.cost = None
+        # The cost is at most bound times the optimal cost, None when the planner does not say
+        self.bound = None
+    # Path length in cells, counting the start
+    def finish(self, path, cost):
+        self.length = len(path)
+        self.cost = cost
+    def report(self):
+        line = "expanded %d, generated %d, peak frontier %d, relaxations %d, %.2f ms, length %d, cost %s" % (
+            self.expanded, self.generated, self.peak_frontier, self.relaxations,
+            self.seconds*1000, self.length, self.cost)
+        if self.bound is not None:
+            line += ", bound %.2f" % self.bound
+        return line
+
+class Result:
+    def __init__(self, path, cost, expanded, stats=None):
+        # Path is a list of (row, col) from start to goal, empty if there is no path
+        self.path = path
+        self.cost = cost
+        self.expanded = expanded
+        self.stats = stats if stats is not None else SearchStats()
+        self.stats.expanded = expanded
+        self.stats.finish(path, cost)
+    def found(self):
+        return len(self.path) > 0
+
+# Follow the previous links back from goal and build the result
+def make_result(gmap, previous, start, goal, expanded, stats=None):
+    if goal != start and previous.get(goal) is None:
+        return Result([], None, expanded, stats)
+    path = [goal]
+    cost = 0
+    current = goal
+    while current != start:
+        cost += gmap.cost(current)
+        current = previous[current]
+        path.append(current)
+    path.reverse()
+    return Result([gmap.pos(i) for i in path], cost, expanded, stats)
+
+# The searches below run as generators that yield once per expansion, so the Agent can draw one step
+# per frame, while the headless planners run them to the end with _run. Each step is a tuple
+# (expanded, generated, result): the flat index expanded or None when the frontier ran out, the flat
+# indices pushed onto the frontier in that step, and the Result on the last step, None before it
+def _run(steps):
+    for expanded, generated, result in steps:
+        pass
+    return result
+
+# DFS and BFS share everything except which end of the frontier is popped. Both stop as soon as
+# the goal is generated
+def _blind_steps(gmap, start, goal, lifo, sink):
+    began = timer()
+    start = gmap.index(start)
+    goal = gmap.index(goal)
+    previous = {}
+    if start == goal:
+        yield None, [], make_result(gmap, previous, start, goal, 0, _blind_stats(began, 1, 1))
+        return
+    # seen marks nodes that are either explored or in the frontier
+    seen = bytearray(gmap.size)
+    seen[start] = 1
+    frontier = deque([start])
+    pop = frontier.pop if lifo else frontier.popleft
+    neighbors = gmap.neighbors
+    expanded = 0
+    generated = 1
+    peak = 1
+    while frontier:
+        current = pop()
+        expanded += 1
+        if sink is not None:
+            sink.event("expand", gmap.pos(current))
+        pushed = []
+        for node in neighbors(current):
+            if seen[node]:
+                continue
+            seen[node] = 1
+            previous[node] = current
+            if node == goal:
+                yield current, pushed, make_result(gmap, previous, start, goal, expanded,
+                                                   _blind_stats(began, generated, peak))
+                return
+            frontier.append(node)
+            pushed.append(node)
+            generated += 1
+            if len(frontier) > peak:
+                peak = len(frontier)
+            if sink is not None:
+                sink.event("generate", gmap.pos(node))
+        yield current, pushed, None
+    yield None, [], make_result(gmap, previous, start, goal, expanded, _blind_stats(began, generated, peak))
+
+def _blind_stats(began, generated, peak):
+    stats = SearchStats()
+    stats.generated = generated
+    stats.peak_frontier = peak
+    stats.seconds = timer() - began
+    return stats
+
+def dfs(gmap, start, goal, sink=None):
+    return _run(_blind_steps(gmap, start, goal, True, sink))
+
+def bfs(gmap, start, goal, sink=None):
+    return _run(_blind_steps(gmap, start, goal, False, sink))
+
+# UCS and A* are the same best-first search with a different priority. Instead of searching the
+# heap for a node to relax, a cheaper entry is pushed and the old one is skipped when popped
+def _best_first_steps(gmap, start, goal, heuristic, sink):
+    began = timer()
+    start = gmap.index(start)
+    goal = gmap.index(goal)
+    previous = {}
+    costs = {start: 0}
+    closed = bytearray(gmap.size)
+    frontier = [(heuristic(start), start)]
+    neighbors = gmap.neighbors
+    grass = gmap.grass
+    expanded = 0
+    relaxations = 0
+    peak = 1
+    while frontier:
+        current = heappop(frontier)[1]
+        if closed[current]:
+            continue
+        closed[current] = 1
+        expanded += 1
+        if sink is not None:
+            sink.event("expand", gmap.pos(current))
+        if current == goal:
+            yield current, [], make_result(gmap, previous, start, goal, expanded,
+                                           _best_first_stats(began, costs, relaxations, peak))
+            return
+        currentCost = costs[current]
+        pushed = []
+        for node in neighbors(current):
+            if closed[node]:
+                continue
+            altCost = currentCost + (MAX_COST if grass[node] else 1)
+            oldCost = costs.get(node)
+            if oldCost is None or altCost < oldCost:
+                if oldCost is not None:
+                    relaxations += 1
+                costs[node] = altCost
+                previous[node] = current
+                heappush(frontier, (altCost + heuristic(node), node))
+                pushed.append(node)
+                if len(frontier) > peak:
+                    peak = len(frontier)
+                if sink is not None:
+                    sink.event("generate", gmap.pos(node))
+        yield current, pushed, None
+    yield None, [], make_result(gmap, previous, start, goal, expanded, _best_first_stats(began, costs, relaxations, peak))
+
+def ucs(gmap, start, goal, sink=None):
+    return _run(_best_first_steps(gmap, start, goal, lambda node: 0, sink))
+
+# A heuristic takes the map and the goal and returns a function giving, for a flat index, a lower bound
+# on the cost of reaching the goal from it. Moving into a cell costs at least MIN_COST, so Manhattan
+# distance times MIN_COST never overestimates. The table based ones live in heuristics.py
+def manhattan(gmap, goal):
+    cols = gmap.cols
+    goalRow, goalCol = goal
+    def heuristic(node):
+        row, col = divmod(node, cols)
+        return MIN_COST*(abs(row - goalRow) + abs(col - goalCol))
+    return heuristic
+
+# Imported the first time one is used, heuristics.py needs numpy
+def alt(gmap, goal):
+    from heuristics import alt
+    return alt(gmap, goal)
+
+def table(gmap, goal):
+    from heuristics import table
+    return table(gmap, goal)
+
+HEURISTICS = {"manhattan": manhattan, "alt": alt, "table": table}
+
+# heuristic is a name in HEURISTICS or a function already built for goal, which lets many queries to the
+# same goal share one table
+def make_heuristic(gmap, goal, heuristic):
+    if callable(heuristic):
+        return heuristic
+    return HEURISTICS[heuristic](gmap, goal)
+
+# Weighted A*. With a weight above 1 it expands fewer nodes and the path costs at most weight times the
+# optimal cost, closed nodes are never reopened and that bound still holds for consistent heuristics
+def astar(gmap, start, goal, heuristic_weight=1, heuristic="manhattan", sink=None):
+    return _run(_astar_steps(gmap, start, goal, heuristic_weight, heuristic, sink))
+
+def _astar_steps(gmap, start, goal, heuristic_weight=1, heuristic="manhattan", sink=None):
+    began = timer()
+    estimate = make_heuristic(gmap, goal, heuristic)
+    if heuristic_weight == 1:
+        weighted = estimate
+    else:
+        weighted = lambda node: heuristic_weight*estimate(node)
+    for expanded, generated, result in _best_first_steps(gmap, start, goal, weighted, sink):
+        if result is not None:
+            # Building a table based heuristic is part of the search time
+            result.stats.seconds = timer() - began
+            result.stats.bound = max(heuristic_weight, 1)
+        yield expanded, generated, result
+
+# Every node gets one entry in costs when first generated, so the pushes are those plus the relaxations.
+# The frontier peak counts stale entries still waiting to be skipped, as that is what the queue holds
+def _best_first_stats(began, costs, relaxations, peak):
+    stats = SearchStats()
+    stats.generated = len(costs) + relaxations
+    stats.relaxations = relaxations
+    stats.peak_frontier = peak
+    stats.seconds = timer() - began
+    return stats
+
+# Uniform cost search on a bucket queue, costs are small integers so no heap is needed
+def dial(gmap, start, goal, sink=None):
+    return _run(_dial_steps(gmap, start, goal, sink))
+
+def _dial_steps(gmap, start, goal, sink=None):
+    began = timer()
+    start = gmap.index(start)
+    goal = gmap.index(goal)
+    previous = {}
+    costs = {start: 0}
+    closed = bytearray(gmap.size)
+    frontier = BucketQueue()
+    frontier.push(0, start)
+    neighbors = gmap.neighbors
+    grass = gmap.grass
+    expanded = 0
+    relaxations = 0
+    peak = 1
+    while frontier:
+        currentCost, current = frontier.pop()
+        # Skip entries left behind when a node was pushed again with a lower cost
+        if closed[current]:
+            continue
+        closed[current] = 1
+        expanded += 1
+        if sink is not None:
+            sink.event("expand", gmap.pos(current))
+        if current == goal:
+            yield current, [], make_result(gmap, previous, start, goal, expanded,
+                                           _best_first_stats(began, costs, relaxations, peak))
+            return
+        pushed = []
+        for node in neighbors(current):
+            if closed[node]:
+                continue
+            altCost = currentCost + (MAX_COST if grass[node] else 1)
+            oldCost = costs.get(node)
+            if oldCost is None or altCost < oldCost:
+                if oldCost is not None:
+                    relaxations += 1
+                costs[node] = altCost
+                previous[node] = current
+                frontier.push(altCost, node)
+                pushed.append(node)
+                if frontier.count > peak:
+                    peak = frontier.count
+                if sink is not None:
+                    sink.event("generate", gmap.pos(node))
+        yield current, pushed, None
+    yield None, [], make_result(gmap, previous, start, goal, expanded, _best_first_stats(began, costs, relaxations, peak))
+
+# Anytime repairing A* (Likhachev, Gordon and Thrun). Starts as weighted A* and after each path lowers
+# the weight and repairs the search instead of starting over: only nodes whose cost dropped after they
+# were expanded (the inconsistent ones) go back into the frontier. Yields a Result for every path it
+# finds, each with the bound it proved, down to an optimal one
+def ara_iter(gmap, start, goal, weight=3.0, decrease=0.5, heuristic="manhattan"):
+    began = timer()
+    estimate = make_heuristic(gmap, goal, heuristic)
+    start = gmap.index(start)
+    goal = gmap.index(goal)
+    previous = {}
+    costs = {start: 0}
+    neighbors = gmap.neighbors
+    grass = gmap.grass
+    stats = SearchStats()
+    # Nodes in the frontier, heap entries for anything else or with another priority are stale
+    opened = {start: weight*estimate(start)}
+    frontier = [(opened[start], start)]
+    # Expanded this round, and expanded this round but cheaper since
+    closed = bytearray(gmap.size)
+    inconsistent = set()
+    while True:
+        while frontier:
+            priority, current = frontier[0]
+            if opened.get(current) != priority:
+                heappop(frontier)
+                continue
+            if priority >= costs.get(goal, INF):
+                break
+            heappop(frontier)
+            del opened[current]
+            closed[current] = 1
+            stats.expanded += 1
+            currentCost = costs[current]
+            for node in neighbors(current):
+                altCost = currentCost + (MAX_COST if grass[node] else 1)
+                oldCost = costs.get(node)
+                if oldCost is not None and altCost >= oldCost:
+                    continue
+                if oldCost is not None:
+                    stats.relaxations += 1
+                costs[node] = altCost
+                previous[node] = current
+                if closed[node]:
+                    inconsistent.add(node)
+                else:
+                    opened[node] = altCost + weight*estimate(node)
+                    heappush(frontier, (opened[node], node))
+                    stats.generated += 1
+                    if len(frontier) > stats.peak_frontier:
+                        stats.peak_frontier = len(frontier)
+        # The cheapest unweighted F left is a lower bound on the optimal cost
+        lowest = min([costs[node] + estimate(node) for node in list(opened) + list(inconsistent)] or [INF])
+        result = make_result(gmap, previous, start, goal, stats.expanded, copy(stats))
+        if not result.found():
+            result.stats.seconds = timer() - began
+            yield result
+            return
+        bound = min(weight, float(result.cost)/lowest) if lowest > 0 else weight
+        result.stats.bound = max(bound, 1.0)
+        result.stats.seconds = timer() - began
+        yield result
+        if bound <= 1:
+            return
+        weight = max(weight - decrease, 1)
+        for node in inconsistent:
+            opened[node] = 0
+        inconsistent = set()
+        frontier = []
+        for node in opened:
+            opened[node] = costs[node] + weight*estimate(node)
+            frontier.append((opened[node], node))
+        heapify(frontier)
+        closed = bytearray(gmap.size)
+
+# Runs ARA* until the path is optimal or time_limit seconds have passed, whichever comes first, and
+# returns the last path found. The first path is always waited for
+def ara(gmap, start, goal, weight=3.0, decrease=0.5, heuristic="manhattan", time_limit=None):
+    began = timer()
+    for result in ara_iter(gmap, start, goal, weight, decrease, heuristic):
+        if time_limit is not None and timer() - began >= time_limit:
+            break
+    return result
+
+# Jump point search for 4-connected grids where every move costs the same. Paths are kept canonical
+# (horizontal moves are tried before vertical ones), so a horizontal jump only stops on the goal or a
+# cell where a vertical jump finds something, and a vertical jump stops on the goal or where a wall
+# beside it ends. Everything in between is skipped instead of going through the frontier
+def _open(gmap, row, col):
+    return 0 <= row < gmap.rows and 0 <= col < gmap.cols and not gmap.puddle[row*gmap.cols + col]
+
+def _jump_vertical(gmap, row, col, dr, goal):
+    puddle = gmap.puddle
+    cols = gmap.cols
+    step = dr*cols
+    index = row*cols + col
+    goalIndex = goal[0]*cols + goal[1]
+    left = col > 0
+    right = col < cols-1
+    while True:
+        row += dr
+        index += step
+        if row < 0 or row >= gmap.rows or puddle[index]:
+            return None
+        if index == goalIndex:
+            return (row, col)
+        # The cell beside this one is open but the one behind it was not
+        if left and not puddle[index-1] and puddle[index-1-step]:
+            return (row, col)
+        if right and not puddle[index+1] and puddle[index+1-step]:
+            return (row, col)
+
+def _jump_horizontal(gmap, row, col, dc, goal):
+    puddle = gmap.puddle
+    cols = gmap.cols
+    index = row*cols + col
+    while True:
+        col += dc
+        index += dc
+        if col < 0 or col >= cols or puddle[index]:
+            return None
+        if (row, col) == goal or _jump_vertical(gmap, row, col, -1, goal) or _jump_vertical(gmap, row, col, 1, goal):
+            return (row, col)
+
+# Returns (jump point, distance) pairs reachable from node, parent is the jump point node was reached
+# from or None for the start
+def jump_successors(gmap, node, parent, goal):
+    row, col = node
+    if parent is None:
+        directions = ACTIONS
+    elif parent[0] == row:
+        dc = 1 if col > parent[1] else -1
+        directions = [(0,dc), (-1,0), (1,0)]
+    else:
+        dr = 1 if row > parent[0] else -1
+        directions = [(dr,0)] + [(0,side) for side in (-1, 1)
+            if _open(gmap, row, col+side) and not _open(gmap, row-dr, col+side)]
+    successors = []
+    for dr, dc in directions:
+        if dr == 0:
+            point = _jump_horizontal(gmap, row, col, dc, goal)
+        else:
+            point = _jump_vertical(gmap, row, col, dr, goal)
+        if point is not None:
+            successors.append((point, abs(point[0] - row) + abs(point[1] - col)))
+    return successors
+
+# Fills in the cells between consecutive jump points
+def expand_jumps(points):
+    path = points[:1]
+    for point in points[1:]:
+        row, col = path[-1]
+        dr = (point[0] > row) - (point[0] < row)
+        dc = (point[1] > col) - (point[1] < col)
+        while (row, col) != point:
+            row += dr
+            col += dc
+            path.append((row, col))
+    return path
+
+# Only valid when every open cell costs the same, so maps with grass fall back to A*
+def jps(gmap, start, goal, sink=None):
+    if 1 in gmap.grass:
+        return astar(gmap, start, goal, sink=sink)
+    return _run(_jps_steps(gmap, start, goal, sink))
+
+def _jps_steps(gmap, start, goal, sink=None):
+    began = timer()
+    previous = {start: None}
+    costs = {start: 0}
+    closed = set()
+    frontier = HeapQueue()
+    frontier.push((0, 0), start)
+    expanded = 0
+    relaxations = 0
+    peak = 1
+    while frontier:
+        current = frontier.pop()[1]
+        if current in closed:
+            continue
+        closed.add(current)
+        expanded += 1
+        if sink is not None:
+            sink.event("expand", current)
+        if current == goal:
+            points = [goal]
+            while previous[points[-1]] is not None:
+                points.append(previous[points[-1]])
+            path = expand_jumps(points[::-1])
+            yield gmap.index(current), [], Result(path, costs[goal], expanded,
+                                                  _best_first_stats(began, costs, relaxations, peak))
+            return
+        pushed = []
+        for node, distance in jump_successors(gmap, current, previous[current], goal):
+            altCost = costs[current] + distance
+            # Ties on F go to the deeper node, on open ground this avoids expanding every jump point
+            # on equally good paths
+            if node not in closed and altCost < costs.get(node, altCost + 1):
+                if node in costs:
+                    relaxations += 1
+                costs[node] = altCost
+                previous[node] = current
+                frontier.push((altCost + abs(node[0] - goal[0]) + abs(node[1] - goal[1]), -altCost), node)
+                pushed.append(gmap.index(node))
+                if len(frontier) > peak:
+                    peak = len(frontier)
+                if sink is not None:
+                    sink.event("generate", node)
+        yield gmap.index(current), pushed, None
+    yield None, [], Result([], None, expanded, _best_first_stats(began, costs, relaxations, peak))
+
+# Bidirectional searches grow one tree from start using previous and one from goal using following,
+# which points one step toward the goal. They meet on an edge (u, v) with u in the start tree and v in
+# the goal tree, and the goal half is then spliced into previous so the path is read back as usual
+def _splice(gmap, previous, following, start, goal, meet, expanded):
+    if meet is None:
+        return Result([], None, expanded)
+    node, current = meet
+    previous[current] = node
+    while current != goal:
+        previous[following[current]] = current
+        current = following[current]
+    return make_result(gmap, previous, start, goal, expanded)
+
+# Expands one whole BFS layer at a time from whichever side has the smaller frontier, and stops after
+# the first layer that touches the other tree
+def bibfs(gmap, start, goal):
+    start = gmap.index(start)
+    goal = gmap.index(goal)
+    previous = {}
+    following = {}
+    if start == goal:
+        return make_result(gmap, previous, start, goal, 0)
+    # The goal side starts on the goal, which the one-way searches never enter if it is a puddle
+    if gmap.puddle[goal]:
+        return Result([], None, 0)
+    distF = {start: 0}
+    distB = {goal: 0}
+    frontF = [start]
+    frontB = [goal]
+    neighbors = gmap.neighbors
+    best = None
+    meet = None
+    expanded = 0
+    while frontF and frontB and best is None:
+        forward = len(frontF) <= len(frontB)
+        if forward:
+            front, dist, other, links = frontF, distF, distB, previous
+        else:
+            front, dist, other, links = frontB, distB, distF, following
+        layer = []
+        for current in front:
+            expanded += 1
+            for node in neighbors(current):
+                if node in other:
+                    total = dist[current] + 1 + other[node]
+                    if best is None or total < best:
+                        best = total
+                        meet = (current, node) if forward else (node, current)
+                if node not in dist:
+                    dist[node] = dist[current] + 1
+                    links[node] = current
+                    layer.append(node)
+        if forward:
+            frontF = layer
+        else:
+            frontB = layer
+    return _splice(gmap, previous, following, start, goal, meet, expanded)
+
+# Bidirectional best-first search. Moving into a cell costs that cell, so the goal side pays for the
+# cell it is expanding rather than for the neighbor. best is the cheapest path through a meeting edge
+# seen so far; UCS stops once the two lowest G costs add up to at least best, A* once either side's
+# lowest F reaches it, since both heuristics are admissible and consistent
+def _bidirectional(gmap, start, goal, heuristicF, heuristicB, sumStop):
+    start = gmap.index(start)
+    goal = gmap.index(goal)
+    previous = {}
+    following = {}
+    if start == goal:
+        return make_result(gmap, previous, start, goal, 0)
+    if gmap.puddle[goal]:
+        return Result([], None, 0)
+    costF = {start: 0}
+    costB = {goal: 0}
+    closedF = bytearray(gmap.size)
+    closedB = bytearray(gmap.size)
+    heapF = [(heuristicF(start), start)]
+    heapB = [(heuristicB(goal), goal)]
+    neighbors = gmap.neighbors
+    grass = gmap.grass
+    best = None
+    meet = None
+    expanded = 0
+    while True:
+        while heapF and closedF[heapF[0][1]]:
+            heappop(heapF)
+        while heapB and closedB[heapB[0][1]]:
+            heappop(heapB)
+        if not heapF or not heapB:
+            break
+        if best is not None:
+            if sumStop and heapF[0][0] + heapB[0][0] >= best:
+                break
+            if not sumStop and (heapF[0][0] >= best or heapB[0][0] >= best):
+                break
+        expanded += 1
+        if len(heapF) <= len(heapB):
+            current = heappop(heapF)[1]
+            closedF[current] = 1
+            for node in neighbors(current):
+                altCost = costF[current] + (MAX_COST if grass[node] else 1)
+                if node in costB and (best is None or altCost + costB[node] < best):
+                    best = altCost + costB[node]
+                    meet = (current, node)
+                if not closedF[node] and altCost < costF.get(node, altCost + 1):
+                    costF[node] = altCost
+                    previous[node] = current
+                    heappush(heapF, (altCost + heuristicF(node), node))
+        else:
+            current = heappop(heapB)[1]
+            closedB[current] = 1
+            altCost = costB[current] + (MAX_COST if grass[current] else 1)
+            for node in neighbors(current):
+                if node in costF and (best is None or costF[node] + altCost < best):
+                    best = costF[node] + altCost
+                    meet = (node, current)
+                if not closedB[node] and altCost < costB.get(node, altCost + 1):
+                    costB[node] = altCost
+                    following[node] = current
+                    heappush(heapB, (altCost + heuristicB(node), node))
+    return _splice(gmap, previous, following, start, goal, meet, expanded)
+
+def biucs(gmap, start, goal):
+    zero = lambda node: 0
+    return _bidirectional(gmap, start, goal, zero, zero, True)
+
+# Both sides use the average of the two Manhattan distances, half the distance to goal minus half the
+# distance to start forward and its negative backward. The two potentials are consistent with each other,
+# so both searches work on the same reduced costs and can stop as soon as their smallest keys add up to
+# the best path, like biucs, instead of waiting for either side alone to reach it
+def biastar(gmap, start, goal):
+    cols = gmap.cols
+    def potential(node):
+        row, col = divmod(node, cols)
+        return MIN_COST*(abs(row - goal[0]) + abs(col - goal[1]) - abs(row - start[0]) - abs(col - start[1]))/2.0
+    return _bidirectional(gmap, start, goal, potential, lambda node: -potential(node), True)
+
+# Planners kept in their own modules, imported the first time one is asked for so plan knows every type
+# without its caller importing them
+def lpa(gmap, start, goal):
+    from incremental import lpa
+    return lpa(gmap, start, goal)
+
+def hpa(gmap, start, goal):
+    from hpa import hpa
+    return hpa(gmap, start, goal)
+
+PLANNERS = {"dfs": dfs, "bfs": bfs, "ucs": ucs, "astar": astar, "dial": dial, "jps": jps, "lpa": lpa,
+            "bibfs": bibfs, "biucs": biucs, "biastar": biastar, "ara": ara, "hpa": hpa}
+
+# The planners that can also be run one expansion at a time, see _run
+STEPPERS = {"dfs": lambda gmap, start, goal, sink=None: _blind_steps(gmap, start, goal, True, sink),
+            "bfs": lambda gmap, start, goal, sink=None: _blind_steps(gmap, start, goal, False, sink),
+            "ucs": lambda gmap, start, goal, sink=None: _best_first_steps(gmap, start, goal, lambda node: 0, sink),
+            "astar": _astar_steps, "dial": _dial_steps, "jps": _jps_steps}
+
+# Same as plan, but returns the search as a generator of steps. jps does not fall back to A* here, the
+# caller has to pick astar itself on maps with grass
+def search_steps(gmap, start, goal, type, **options):
+    return STEPPERS[type](gmap, start, goal, **options)
+
+# Runs the planner named by type from start to goal, start and goal are (row, col) tuples. Options
+# are passed on, e.g. sink for dfs, bfs, ucs, astar, dial and jps
+def plan(gmap, start, goal, type, **options):
+    return PLANNERS[type](gmap, start, goal, **options)
+
+class PathCache:
+    # Least recently used cache of results keyed on (start, goal, type, map version). Editing the map
+    # bumps its version, so stale results are never returned and just age out
+    def __init__(self, size=256):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    def __len__(self):
+        return len(self.entries)
+    def get(self, key):
+        result = self.entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.pop(key)
+        self.entries[key] = result
+        return result
+    def put(self, key, result):
+        self.entries.pop(key, None)
+        self.entries[key] = result
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+    # Options that change the result, like the heuristic and its weight, are part of the key
+    @staticmethod
+    def key(start, goal, type, version, options):
+        return (start, goal, type, version) + tuple(sorted(options.items()))
+    # Same as plan, but answers repeated queries on an unchanged map from the cache
+    def plan(self, gmap, start, goal, type, **options):
+        key = self.key(start, goal, type, gmap.version, options)
+        result = self.get(key)
+        if result is None:
+            result = plan(gmap, start, goal, type, **options)
+            self.put(key, result)
+        return result
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries),
+                "hit_rate": float(self.hits)/total if total else 0.0}
@@ -0,0 +1,182 @@
+from __future__ import print_function
+# Seeded benchmark suite: every planner runs headlessly on the same random maps over a range of sizes
+# and puddle densities, and the expansions, times and costs are summed up as percentiles per size,
+# density and planner in a CSV and/or JSON report. The same seed always gives the same maps and queries,
+# so two reports can be compared to catch regressions:
+#   python suite.py --maps 1000 --sizes 50,100,200 --json new.json --compare old.json
+import argparse
+import csv
+import json
+import math
+import multiprocessing
+import random
+import sys
+from timeit import default_timer as timer
+from planner import GridMap, PLANNERS, plan
+
+DEFAULT_PLANNERS = "bfs,ucs,astar,dial,bibfs,biastar"
+# Measures reported as percentiles
+MEASURES = ["expanded", "seconds", "cost"]
+PERCENTILES = [50, 90, 99]
+
+# Puddles with odds density, then grass with odds grass on the cells left. Start and goal are two
+# distinct open cells picked by the same generator, so the query depends only on the seed
+def density_map(size, density, grass, seed):
+    rng = random.Random(seed)
+    gmap = GridMap(size, size)
+    draw = rng.random
+    gmap.puddle[:] = bytearray(1 if draw() < density else 0 for i in range(gmap.size))
+    gmap.grass[:] = bytearray(1 if not gmap.puddle[i] and draw() < grass else 0 for i in range(gmap.size))
+    start = gmap.pos(rng.randrange(gmap.size))
+    goal = gmap.pos(rng.randrange(gmap.size))
+    while goal == start:
+        goal = gmap.pos(rng.randrange(gmap.size))
+    for pos in (start, goal):
+        gmap.puddle[gmap.index(pos)] = 0
+        gmap.grass[gmap.index(pos)] = 0
+    return gmap, start, goal
+
+# Seed of one map, mixed from the suite seed and the map's place in the suite
+def map_seed(seed, size, density, number):
+    return ((seed*7919 + size)*104729 + int(density*1000))*1000003 + number
+
+# Runs every planner on one map, one row per planner
+def run_map(job):
+    size, density, grass, seed, planners = job
+    gmap, start, goal = density_map(size, density, grass, seed)
+    rows = []
+    for name in planners:
+        began = timer()
+        result = plan(gmap, start, goal, name)
+        seconds = timer() - began
+        rows.append({"size": size, "density": density, "seed": seed, "planner": name,
+                     "found": result.found(), "expanded": result.expanded, "seconds": seconds,
+                     "cost": result.cost, "length": len(result.path)})
+    return rows
+
+def run_suite(sizes, densities, maps, planners, grass=0.25, seed=0, processes=None):
+    jobs = [(size, density, grass, map_seed(seed, size, density, number), planners)
+            for size in sizes for density in densities for number in range(maps)]
+    rows = []
+    if processes and processes > 1:
+        pool = multiprocessing.Pool(processes)
+        try:
+            for mapRows in pool.imap_unordered(run_map, jobs, chunksize=max(1, len(jobs)//(processes*8))):
+                rows.extend(mapRows)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for job in jobs:
+            rows.extend(run_map(job))
+    return rows
+
+# Nearest rank percentile of sorted values
+def percentile(values, p):
+    if not values:
+        return None
+    rank = int(math.ceil(p/100.0*len(values))) - 1
+    return values[max(0, min(len(values)-1, rank))]
+
+# One summary per (size, density, planner). Costs only count maps where a path was found
+def summarize(rows):
+    groups = {}
+    for row in rows:
+        groups.setdefault((row["size"], row["density"], row["planner"]), []).append(row)
+    summaries = []
+    for (size, density, planner), members in sorted(groups.items()):
+        summary = {"size": size, "density": density, "planner": planner, "maps": len(members),
+                   "found": sum(1 for row in members if row["found"])}
+        for measure in MEASURES:
+            values = sorted(row[measure] for row in members if row[measure] is not None)
+            summary[measure + "_mean"] = float(sum(values))/len(values) if values else None
+            for p in PERCENTILES:
+                summary["%s_p%d" % (measure, p)] = percentile(values, p)
+        summaries.append(summary)
+    return summaries
+
+def columns():
+    names = ["size", "density", "planner", "maps", "found"]
+    for measure in MEASURES:
+        names.append(measure + "_mean")
+        names.extend("%s_p%d" % (measure, p) for p in PERCENTILES)
+    return names
+
+def write_csv(path, summaries):
+    with open(path, "w") as f:
+        writer = csv.DictWriter(f, columns())
+        writer.writeheader()
+        writer.writerows(summaries)
+
+def write_json(path, config, summaries):
+    with open(path, "w") as f:
+        json.dump({"config": config, "summaries": summaries}, f, indent=1, sort_keys=True)
+
+# Summaries whose median expansions, cost or time grew by more than tolerance over the old report. Time is
+# noisy between machines and runs, expansions are not: with the same seed they only change with the code
+def regressions(old, new, tolerance=0.1):
+    before = dict(((s["size"], s["density"], s["planner"]), s) for s in old["summaries"])
+    found = []
+    for summary in new["summaries"]:
+        previous = before.get((summary["size"], summary["density"], summary["planner"]))
+        if previous is None:
+            continue
+        for measure in ("expanded_p50", "cost_p50", "seconds_p50"):
+            if previous[measure] and summary[measure] is not None and summary[measure] > previous[measure]*(1 + tolerance):
+                found.append((summary["size"], summary["density"], summary["planner"], measure,
+                              previous[measure], summary[measure]))
+    return found
+
+def print_table(summaries):
+    print("%-6s %-8s %-8s %6s %10s %10s %10s %10s %8s" % ("size", "density", "planner", "found",
+        "exp p50", "exp p90", "ms p50", "ms p90", "cost p50"))
+    for s in summaries:
+        print("%-6d %-8.2f %-8s %6d %10s %10s %10.3f %10.3f %8s" % (s["size"], s["density"], s["planner"], s["found"],
+            s["expanded_p50"], s["expanded_p90"], 1000*s["seconds_p50"], 1000*s["seconds_p90"], s["cost_p50"]))
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Seeded benchmark suite for the headless planners")
+    parser.add_argument("--sizes", default="50,100,200")
+    parser.add_argument("--densities", default="0.1,0.2,0.3", help="puddle odds per cell")
+    parser.add_argument("--grass", type=float, default=0.25, help="grass odds per cell without a puddle")
+    parser.add_argument("--maps", type=int, default=200, help="maps per size and density")
+    parser.add_argument("--planners", default=DEFAULT_PLANNERS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--csv")
+    parser.add_argument("--json")
+    parser.add_argument("--compare", help="earlier JSON report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args(argv)
+    planners = args.planners.split(",")
+    for name in planners:
+        if name not in PLANNERS:
+            parser.error("unknown planner " + name)
+    config = {"sizes": [int(size) for size in args.sizes.split(",")],
+              "densities": [float(density) for density in args.densities.split(",")],
+              "grass": args.grass, "maps": args.maps, "planners": planners, "seed": args.seed}
+    began = timer()
+    rows = run_suite(config["sizes"], config["densities"], args.maps, planners, args.grass, args.seed, args.processes)
+    summaries = summarize(rows)
+    print_table(summaries)
+    print("%d runs in %.1f s" % (len(rows), timer() - began))
+    if args.csv:
+        write_csv(args.csv, summaries)
+    if args.json:
+        write_json(args.json, config, summaries)
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        if old["config"] != config:
+            print("Warning: " + args.compare + " was made with different settings")
+        found = regressions(old, {"summaries": summaries}, args.tolerance)
+        for size, density, planner, measure, before, after in found:
+            print("%s: size %d, density %.2f, %s %s %s -> %s" % ("Slower" if measure == "seconds_p50" else "Regression",
+                size, density, planner, measure, before, after))
+        # Only expansions and cost fail the run, time is reported but too noisy to fail on
+        if any(measure != "seconds_p50" for size, density, planner, measure, before, after in found):
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,82 @@
+from __future__ import print_function
+# Trace sinks for the searches. With no sink nothing is recorded, CounterSink only counts events, and
+# the two writers buffer every event to a file that read_trace can replay in order afterwards.
+import json
+import struct
+from collections import Counter
+
+# Event kinds, the binary format stores the position in this list
+KINDS = ["expand", "generate", "seen", "puddle", "out_of_range"]
+
+BINARY_MAGIC = b"TRC1"
+RECORD = struct.Struct("<Bii")
+
+class CounterSink:
+    def __init__(self):
+        self.counts = Counter()
+    def event(self, kind, pos):
+        self.counts[kind] += 1
+    def close(self):
+        pass
+
+class JsonlSink:
+    # One JSON object per line, written out every buffer_size events
+    def __init__(self, path, buffer_size=4096):
+        self.file = open(path, "w")
+        self.buffer = []
+        self.buffer_size = buffer_size
+    def event(self, kind, pos):
+        self.buffer.append(json.dumps({"event": kind, "pos": [pos[0], pos[1]]}))
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+    def flush(self):
+        if self.buffer:
+            self.file.write("\n".join(self.buffer) + "\n")
+            self.buffer = []
+    def close(self):
+        self.flush()
+        self.file.close()
+
+class BinarySink:
+    # Fixed size records of (kind, row, col) after a four byte magic, written out every buffer_size bytes
+    def __init__(self, path, buffer_size=1 << 16):
+        self.file = open(path, "wb")
+        self.file.write(BINARY_MAGIC)
+        self.buffer = bytearray()
+        self.buffer_size = buffer_size
+        self.codes = dict((kind, code) for code, kind in enumerate(KINDS))
+    def event(self, kind, pos):
+        self.buffer += RECORD.pack(self.codes[kind], pos[0], pos[1])
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+    def flush(self):
+        self.file.write(self.buffer)
+        self.buffer = bytearray()
+    def close(self):
+        self.flush()
+        self.file.close()
+
+# Picks the writer from the file extension, .jsonl is text and anything else binary
+def open_sink(path):
+    if path.endswith(".jsonl"):
+        return JsonlSink(path)
+    return BinarySink(path)
+
+# Yields (kind, (row, col)) for every event in a trace file, in the order they happened
+def read_trace(path):
+    with open(path, "rb") as f:
+        if f.read(len(BINARY_MAGIC)) == BINARY_MAGIC:
+            data = f.read()
+            for offset in range(0, len(data) - RECORD.size + 1, RECORD.size):
+                code, row, col = RECORD.unpack_from(data, offset)
+                yield KINDS[code], (row, col)
+            return
+        f.seek(0)
+        for line in f:
+            if line.strip():
+                record = json.loads(line.decode("utf-8"))
+                yield record["event"], tuple(record["pos"])
+
+# The order nodes were expanded in
+def expansion_order(path):
+    return [pos for kind, pos in read_trace(path) if kind == "expand"]
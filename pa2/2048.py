@@ -20,6 +20,13 @@ COLORS = { 0:BLACK, 2:RED, 4:PINK, 8:PURPLE, 16:DEEP_PURPLE,
                512:ORANGE, 1024: DEEP_ORANGE, 2048:BROWN, 
                4096:DEEP_PURPLE, 8192:DEEP_ORANGE, 16384:BROWN, 32768:TEAL}
 
+# Plies the AI looks ahead, a move and a tile placement are one each
+SEARCH_DEPTH = 5
+# Positions less likely than this are scored by payoff alone, and chance nodes place tiles in at most
+# SAMPLE_SPOTS empty spots
+PROBABILITY_CUTOFF = 0.005
+SAMPLE_SPOTS = 4
+
 class Game:
 	def __init__(self):
 		self.total_points = 0
@@ -32,6 +39,8 @@ class Game:
 		self.scorefont = pygame.font.SysFont("arial", 30)
 		self.tileMatrix = [[0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]
 		self.undoMat = []
+		# Expectimax values the AI has found so far, shared by its searches over the whole game
+		self.table = TranspositionTable()
 	def loop(self, fromLoaded = False):
 		auto = True
 		if not fromLoaded:
@@ -39,15 +48,17 @@ class Game:
 			self.placeRandomTile()
 		self.printMatrix()
 		while True:
-			if auto:
+			# The AI plays on bitboards, which only hold 4x4 boards
+			if auto and self.board_size == 4:
 				if self.checkIfCanGo():
-					#Hint: Check the use of deepcopy
-					ai = Gametree(copy.deepcopy(self.tileMatrix), 3, self.total_points)
+					ai = Gametree(bitboard.from_matrix(self.tileMatrix), SEARCH_DEPTH, self.total_points, table=self.table,
+						cutoff=PROBABILITY_CUTOFF, sample=SAMPLE_SPOTS)
 					direction = ai.compute_decision() 
 					self.move(direction)
 				else:
 					auto = False
 					self.printGameOver()
+					print("Transposition table: " + str(self.table))
 			for event in pygame.event.get():
 				if event.type == QUIT:
 					pygame.quit()
@@ -76,14 +87,23 @@ class Game:
 			pygame.display.update()
 	def move(self, direction):
 		self.addToUndo()
-		for i in range(0, direction):
-			self.rotateMatrixClockwise()
-		if self.canMove():
-			self.moveTiles()
-			self.mergeTiles()
-			self.placeRandomTile()
-		for j in range(0, (4 - direction) % 4):
-			self.rotateMatrixClockwise()
+		if self.board_size == 4:
+			# Same move as the AI simulates, with the row tables in bitboard
+			board = bitboard.from_matrix(self.tileMatrix)
+			moved, points = bitboard.move(board, direction)
+			if moved != board:
+				self.tileMatrix = bitboard.to_matrix(moved)
+				self.total_points += points
+				self.placeRandomTile()
+		else:
+			for i in range(0, direction):
+				self.rotateMatrixClockwise()
+			if self.canMove():
+				self.moveTiles()
+				self.mergeTiles()
+				self.placeRandomTile()
+			for j in range(0, (4 - direction) % 4):
+				self.rotateMatrixClockwise()
 		self.printMatrix()
 	def printMatrix(self):
 		self.surface.fill(BLACK)
@@ -109,7 +129,8 @@ class Game:
 			j = random.randint(0,self.board_size-1)
 			if self.tileMatrix[i][j] == 0:
 				break
-		self.tileMatrix[i][j] = 2
+		# A 4 one time in ten, the odds the AI's chance nodes assume
+		self.tileMatrix[i][j] = self.default_tile if random.random() < 0.9 else 2*self.default_tile
 	def moveTiles(self):
 		tm = self.tileMatrix
 		for i in range(0, self.board_size):
@@ -5,57 +5,76 @@ import collections
 import operator
 import sys
 import math
+import bitboard
 MOVES = {0: 'up', 1: 'left', 2: 'down', 3: 'right'}
+# Tiles a chance node can place, as (bitboard exponent, odds): a 2 nine times out of ten, else a 4
+SPAWNS = [(1, 0.9), (2, 0.1)]
+# Entries a TranspositionTable keeps before evicting
+TABLE_SIZE = 200000
 
 class Gametree:
-	"""main class for the AI"""
-	def __init__(self, root_state, depth_of_tree, current_score): 
+	"""main class for the AI, root_state is a 4x4 board packed by bitboard.from_matrix"""
+	def __init__(self, root_state, depth_of_tree, current_score, lazy=True, table=None, cutoff=0.0, sample=None): 
 		# Set depth of tree
 		self.depth_of_tree = depth_of_tree
 		# Set directions 
 		self.directions = [0, 1, 2, 3]
 		# Initialize root of tree
 		self.root = Node(root_state, True, current_score, -1, 0)
-		# Grow tree from constructor
-		self.growTree(self.root, 0)
+		# A lazy tree is searched without building it, see search. Otherwise grow tree from constructor
+		self.lazy = lazy
+		# Optional TranspositionTable for search, pass the same one to every tree of a game to share it
+		self.table = table
+		# Nodes less likely than cutoff to be reached are valued by payoff instead of being searched, and a
+		# chance node with more than sample empty spots only places tiles in sample of them
+		self.cutoff = cutoff
+		self.sample = sample
+		# Nodes search has visited
+		self.searched = 0
+		if not lazy:
+			self.growTree(self.root, 0, 1.0)
 
-	# In charge of growing the game tree
-	def growTree(self, node, depth):
-		# If you've reached the desired depth then return
-		if(depth == self.depth_of_tree):
+	# In charge of growing the game tree, probability is the chance of reaching node from the root
+	def growTree(self, node, depth, probability):
+		# If you've reached the desired depth or the node is too unlikely then return
+		if(depth == self.depth_of_tree or probability < self.cutoff):
 			return
 		# If node is max player
 		if(node.isMaxPlayer()):
-			# Simulate moving in the four directions and make a chance child node if the board is unique
+			# Simulate moving in the four directions and make a chance child node if the board is unique.
+			# The chance child places the new tile, so the move itself places none
 			for dir in self.directions:
-				sim = Simulator(copy.deepcopy(node.getBoardState()), node.getPoints())
-				sim.move(dir)
+				sim = Simulator(node.getBoardState(), node.getPoints())
+				sim.slide(dir)
 				# Check for unique board states
 				if(sim.getState() != node.getBoardState()):
 					newNode = Node(sim.getState(), False, sim.getPoints(), dir, depth + 1)
 					node.addChild(newNode)
-		# Else if the node is a chance player then randomly choose a spot to add a tile and add it as a max player
+		# Else if the node is a chance player then add each tile the game can place in each empty spot as a max player
 		elif(node.isChancePlayer()):
 			# Get empty spots for the board
-			emptySpots = self.getEmptySpots(node.getBoardState())
-			# Creating a max player for each empty spot
+			emptySpots = self.sampleSpots(node.getBoardState(), self.getEmptySpots(node.getBoardState()))
+			# Creating a max player for each empty spot and tile, weighted by how likely the game places it
 			for spot in emptySpots:
-				board_copy = copy.deepcopy(node.getBoardState())
-				board_copy[spot[0]][spot[1]] = 2
-				newNode = Node(board_copy, True, node.getPoints(), -1, depth + 1)
-				node.addChild(newNode)
+				for exponent, odds in SPAWNS:
+					# Boards are integers, placing a tile makes a new one
+					newBoard = bitboard.place(node.getBoardState(), spot, exponent)
+					newNode = Node(newBoard, True, node.getPoints(), -1, depth + 1, odds/len(emptySpots))
+					node.addChild(newNode)
 		# Call grow tree on every child
 		for child in node.getChildren():
-			self.growTree(child, depth + 1) 
+			self.growTree(child, depth + 1, probability*child.getProbability()) 
+
+	# Takes in a board and returns the empty spots for the board, as cell indices 4*i + j
+	def getEmptySpots(self, board):
+		return bitboard.empty_cells(board)
 
-	# Takes in a board and returns the empty spots for the board
-	def getEmptySpots(self, matrix):
-		zeroPoints = []
-		for i in range(len(matrix)):
-			for j in range(len(matrix[i])):
-				if(matrix[i][j] == 0):
-					zeroPoints.append((i, j))
-		return zeroPoints
+	# The empty spots a chance node places tiles in: all of them, or when there are more than sample,
+	# sample of them picked at random. The pick is seeded by the board so a board is always valued the same
+	def sampleSpots(self, board, emptySpots):
+		if self.sample is None or len(emptySpots) <= self.sample:
+			return emptySpots
+		return random.Random(board).sample(emptySpots, self.sample)
 
 	# Helper function to visualize tree
 	def printTreeLevelOrder(self):
@@ -88,11 +107,11 @@ class Gametree:
 				value = max(value, self.expectimax(child))
 			node.setExpectimax(value)
 			return value
-		# If chance player calculate the average of each of the children
+		# If chance player calculate the average of each of the children, weighted by their probability
 		elif node.isChancePlayer():
 			value = 0
 			for child in node.getChildren():
-				value += self.expectimax(child)*(1.0/len(node.getChildren()))
+				value += self.expectimax(child)*child.getProbability()
 			node.setExpectimax(value)
 			return value
 		else:
@@ -100,30 +119,78 @@ class Gametree:
 			return -1
 
 
+	# Expectimax straight from a board, the same value expectimax gives the node growTree would make for
+	# it. Children are made, searched and dropped one at a time, so only the boards on the path down to
+	# the current one are kept and memory stays linear in the depth. probability is the chance of
+	# reaching the board from the root
+	def search(self, board, points, depth, is_max_player, probability=1.0):
+		self.searched += 1
+		if depth >= self.depth_of_tree or probability < self.cutoff:
+			return self.boardPayoff(board, points)
+		# The points so far are added to every payoff below, so the table keeps values without them and the
+		# same board reached with other points, in another order or another call, is a hit
+		# With a cutoff, a value is only reused where the board is at most as likely as when it was searched,
+		# as a more likely board prunes less. Without one the probability changes nothing and values are
+		# stored as certain. Trees sharing a table should use the same cutoff and sample
+		key = (board, self.depth_of_tree - depth, is_max_player)
+		if not self.cutoff:
+			probability = 1.0
+		if self.table is not None:
+			cached = self.table.get(key, probability)
+			if cached is not None:
+				return cached + points
+		value = None
+		if is_max_player:
+			for dir in self.directions:
+				sim = Simulator(board, points)
+				sim.slide(dir)
+				if sim.getState() != board:
+					childValue = self.search(sim.getState(), sim.getPoints(), depth + 1, False, probability)
+					if value is None or childValue > value:
+						value = childValue
+		else:
+			emptySpots = self.sampleSpots(board, self.getEmptySpots(board))
+			if emptySpots:
+				value = 0
+				for spot in emptySpots:
+					for exponent, odds in SPAWNS:
+						childProbability = odds/len(emptySpots)
+						value += self.search(bitboard.place(board, spot, exponent), points, depth + 1, True,
+							probability*childProbability)*childProbability
+		# No moves or no empty spots makes a terminal node
+		if value is None:
+			value = self.boardPayoff(board, points)
+		if self.table is not None:
+			self.table.put(key, value - points, probability)
+		return value
+
 	# Payoff function to calculate score for board
 	def payoff(self, node):
-		numZeros = 0
+		return self.boardPayoff(node.getBoardState(), node.getPoints())
+
+	def boardPayoff(self, board, points):
+		rows = bitboard.rows(board)
 		# Count number of zeros on the board
-		for i in range(len(node.getBoardState())):
-			for j in range(len(node.getBoardState()[i])):
-				if(node.getBoardState()[i][j] == 0):
-					numZeros+=1
+		numZeros = 0
+		for row in rows:
+			numZeros += bitboard.ROW_EMPTY[row]
 
-		# Calculate monoticity score for board
+		# Calculate monoticity score for board. Summed along a row or column the differences between
+		# neighbors cancel out to the last tile minus the first, so this is looked up per row of the
+		# board and per row of its transpose
 		sum = 0
-		board = node.getBoardState()
-		for j in range(len(board)):
-			for i in range(3):
-				sum += board[i + 1][j] - board[i][j]
-		for j in range(len(board)):
-			for i in range(3):
-				sum += board[j][i + 1] - board[j][i]
+		for row in bitboard.rows(bitboard.transpose(board)):
+			sum += bitboard.ROW_RISE[row]
+		for row in rows:
+			sum += bitboard.ROW_RISE[row]
 
 		# Payoff function is a combination of the monoticity sum, the points, and the number of empty spots
-		return sum + node.getPoints() + numZeros
+		return sum + points + numZeros
 
 	# function to return best decision to game
 	def compute_decision(self):
+		if self.lazy:
+			return self.lazy_decision()
 		# Get optimal expectimax score
 		optimalVal = self.expectimax(self.root)
 		# Choose the direction that gives the optimalVal calculated
@@ -132,10 +199,26 @@ class Gametree:
 				return child.getDirection()
 		return 0
 
+	# compute_decision without a tree: the first direction with the best value, 0 if none can move
+	def lazy_decision(self):
+		board = self.root.getBoardState()
+		best = None
+		decision = 0
+		for dir in self.directions:
+			sim = Simulator(board, self.root.getPoints())
+			sim.slide(dir)
+			if sim.getState() != board:
+				value = self.search(sim.getState(), sim.getPoints(), 1, False)
+				if best is None or value > best:
+					best = value
+					decision = dir
+		return decision
+
 class Node:
 	'''Node class for gametree '''
-	def __init__(self, board_state, is_max_player, board_score, direction, depth):
-		# Save board state, max player, board score, direction and depth for the node
+	def __init__(self, board_state, is_max_player, board_score, direction, depth, probability=1.0):
+		# Save board state, max player, board score, direction and depth for the node, and for children of a
+		# chance node the probability the tile they add is placed
 		self.board_state = board_state
 		self.is_max_player = is_max_player
 		self.board_score = board_score
@@ -143,6 +226,7 @@ class Node:
 		self.direction = direction
 		self.children = []
 		self.depth = depth
+		self.probability = probability
 	
 	# Returns true if node is a max player
 	def isMaxPlayer(self):
@@ -184,23 +268,78 @@ class Node:
 	def getDepth(self):
 		return self.depth
 
+	# Returns the probability of reaching the node from its parent
+	def getProbability(self):
+		return self.probability
+
+class TranspositionTable:
+	'''Expectimax values by (board, remaining depth, max player), each with the probability of reaching
+	the board it was searched at. The least recently used are evicted once size are kept'''
+	def __init__(self, size=TABLE_SIZE):
+		self.size = size
+		self.values = collections.OrderedDict()
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	# Returns the value for key or None. A value searched at a lower probability than the one given was
+	# pruned more than a search now would be, so it counts as a miss. A hit becomes the most recently used
+	def get(self, key, probability=0.0):
+		entry = self.values.pop(key, None)
+		if entry is None:
+			self.misses += 1
+			return None
+		self.values[key] = entry
+		if entry[1] < probability:
+			self.misses += 1
+			return None
+		self.hits += 1
+		return entry[0]
+
+	def put(self, key, value, probability=1.0):
+		self.values.pop(key, None)
+		self.values[key] = (value, probability)
+		if len(self.values) > self.size:
+			self.values.popitem(last=False)
+			self.evictions += 1
+
+	def hitRate(self):
+		lookups = self.hits + self.misses
+		return float(self.hits)/lookups if lookups else 0.0
+
+	def clear(self):
+		self.values.clear()
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	def __len__(self):
+		return len(self.values)
+
+	def __str__(self):
+		return "%d entries, %d hits, %d misses (%.1f%% hit rate), %d evictions" % (len(self.values),
+			self.hits, self.misses, 100*self.hitRate(), self.evictions)
+
 class Simulator:
-	'''Simulator class to simulate moves'''
+	'''Simulator class to simulate moves on a bitboard'''
 	def __init__(self, board_state, total_points):
 		# Takes in board state and total_points
 		self.board_state = board_state
 		self.board_size = 4
 		self.total_points = total_points
 	
+	# Moves with the precomputed row tables in bitboard, a move that changes nothing places no tile
 	def move(self, direction):
-		for i in range(0, direction):
-			self.rotateMatrixClockwise(self.board_state)
-		if self.canMove(self.board_state):
-			self.moveTiles(self.board_state)
-			self.mergeTiles(self.board_state)
-			self.placeRandomTile(self.board_state)
-		for j in range(0, (4 - direction) % 4):
-			self.rotateMatrixClockwise(self.board_state)
+		board, points = bitboard.move(self.board_state, direction)
+		if board != self.board_state:
+			self.total_points += points
+			self.board_state = self.placeRandomTile(board)
+
+	# Move for lookahead: the tiles move and merge but no tile is placed, chance nodes place it
+	def slide(self, direction):
+		board, points = bitboard.move(self.board_state, direction)
+		self.total_points += points
+		self.board_state = board
 
 	def getState(self):
 		return self.board_state
@@ -208,54 +347,6 @@ class Simulator:
 	def getPoints(self):
 		return self.total_points
 
-	def rotateMatrixClockwise(self, tileMatrix):
-		tm = tileMatrix
-		for i in range(0, int(self.board_size/2)):
-			for k in range(i, self.board_size- i - 1):
-				temp1 = tm[i][k]
-				temp2 = tm[self.board_size - 1 - k][i]
-				temp3 = tm[self.board_size - 1 - i][self.board_size - 1 - k]
-				temp4 = tm[k][self.board_size - 1 - i]
-				tm[self.board_size - 1 - k][i] = temp1
-				tm[self.board_size - 1 - i][self.board_size - 1 - k] = temp2
-				tm[k][self.board_size - 1 - i] = temp3
-				tm[i][k] = temp4
-
-	def canMove(self, tileMatrix):
-		tm = tileMatrix
-		for i in range(0, self.board_size):
-			for j in range(1, self.board_size):
-				if tm[i][j-1] == 0 and tm[i][j] > 0:
-					return True
-				elif (tm[i][j-1] == tm[i][j]) and tm[i][j-1] != 0:
-					return True
-		return False
-
-	def moveTiles(self, tileMatrix):
-		tm = tileMatrix
-		for i in range(0, self.board_size):
-			for j in range(0, self.board_size - 1):
-				while tm[i][j] == 0 and sum(tm[i][j:]) > 0:
-					for k in range(j, self.board_size - 1):
-						tm[i][k] = tm[i][k + 1]
-					tm[i][self.board_size - 1] = 0
-	
-	def mergeTiles(self, tileMatrix):
-		tm = tileMatrix
-		for i in range(0, self.board_size):
-			for k in range(0, self.board_size - 1):
-				if tm[i][k] == tm[i][k + 1] and tm[i][k] != 0:
-					tm[i][k] = tm[i][k] * 2
-					tm[i][k + 1] = 0
-					self.total_points += tm[i][k]
-					self.moveTiles(tileMatrix)
-	
-	def placeRandomTile(self, tileMatrix):
-		while True:
-			i = random.randint(0,self.board_size-1)
-			j = random.randint(0,self.board_size-1)
-			if tileMatrix[i][j] == 0:
-				break
-		tileMatrix[i][j] = 2
-
-
+	def placeRandomTile(self, board):
+		exponent = 1 if random.random() < SPAWNS[0][1] else 2
+		return bitboard.place(board, random.choice(bitboard.empty_cells(board)), exponent)
@@ -0,0 +1,109 @@
+from __future__ import absolute_import, division, print_function
+# 4x4 boards packed into one 64 bit integer. Each cell holds the log2 of its tile in 4 bits (0 for an
+# empty cell, 1 for a 2, 2 for a 4 and so on), cell (i, j) of the tile matrix sits at bit 4*(4*i + j),
+# so row i is the 16 bits from 16*i. Every possible row is moved once up front and the results kept
+# in tables, a move on the board is then four table lookups per direction.
+
+# Moves as numbered in Simulator.move: 0 slides each row toward j = 0, 2 toward j = 3, 1 slides each
+# column toward i = 0 and 3 toward i = 3
+ROW_MASK = 0xFFFF
+CELL_MASK = 0xF
+
+def _reverse_row(row):
+	return ((row & 0xF) << 12) | ((row & 0xF0) << 4) | ((row >> 4) & 0xF0) | (row >> 12)
+
+# Results of moving every possible row toward index 0 (LEFT) and toward index 3 (RIGHT), and the points
+# either move scores. Same rules as Simulator.moveTiles and Simulator.mergeTiles: tiles slide together,
+# then equal neighbors merge from index 0 on and a merged tile does not merge again in the same move.
+# Two 32768 tiles would make a tile that does not fit in 4 bits, so they are left alone
+def _build_tables():
+	left = [0]*65536
+	score = [0]*65536
+	for row in range(65536):
+		cells = [(row >> shift) & CELL_MASK for shift in (0, 4, 8, 12)]
+		tiles = [cell for cell in cells if cell]
+		moved = []
+		points = 0
+		k = 0
+		while k < len(tiles):
+			if k + 1 < len(tiles) and tiles[k] == tiles[k + 1] and tiles[k] < CELL_MASK:
+				moved.append(tiles[k] + 1)
+				points += 1 << (tiles[k] + 1)
+				k += 2
+			else:
+				moved.append(tiles[k])
+				k += 1
+		result = 0
+		for j in range(len(moved)):
+			result |= moved[j] << (4*j)
+		left[row] = result
+		score[row] = points
+	right = [_reverse_row(left[_reverse_row(row)]) for row in range(65536)]
+	rightScore = [score[_reverse_row(row)] for row in range(65536)]
+	return left, right, score, rightScore
+
+LEFT, RIGHT, LEFT_SCORE, RIGHT_SCORE = _build_tables()
+
+# Per row, for Gametree.payoff: the number of empty cells, and the tile at index 3 minus the tile at
+# index 0
+def _tile_value(cell):
+	return 0 if cell == 0 else 1 << cell
+ROW_EMPTY = [sum(1 for shift in (0, 4, 8, 12) if not (row >> shift) & CELL_MASK) for row in range(65536)]
+ROW_RISE = [_tile_value(row >> 12) - _tile_value(row & CELL_MASK) for row in range(65536)]
+
+# Swaps rows and columns
+def transpose(board):
+	a1 = board & 0xF0F00F0FF0F00F0F
+	a2 = board & 0x0000F0F00000F0F0
+	a3 = board & 0x0F0F00000F0F0000
+	a = a1 | (a2 << 12) | (a3 >> 12)
+	b1 = a & 0xFF00FF0000FF00FF
+	b2 = a & 0x00FF00FF00000000
+	b3 = a & 0x00000000FF00FF00
+	return b1 | (b2 >> 24) | (b3 << 24)
+
+def _move_rows(board, table, scores):
+	r0 = board & ROW_MASK
+	r1 = (board >> 16) & ROW_MASK
+	r2 = (board >> 32) & ROW_MASK
+	r3 = board >> 48
+	return (table[r0] | (table[r1] << 16) | (table[r2] << 32) | (table[r3] << 48),
+			scores[r0] + scores[r1] + scores[r2] + scores[r3])
+
+# Returns (board after the move, points scored). The board is unchanged if nothing could move, no tile is
+# placed
+def move(board, direction):
+	if direction == 0:
+		return _move_rows(board, LEFT, LEFT_SCORE)
+	if direction == 2:
+		return _move_rows(board, RIGHT, RIGHT_SCORE)
+	if direction == 1:
+		moved, points = _move_rows(transpose(board), LEFT, LEFT_SCORE)
+	else:
+		moved, points = _move_rows(transpose(board), RIGHT, RIGHT_SCORE)
+	return transpose(moved), points
+
+def rows(board):
+	return (board & ROW_MASK, (board >> 16) & ROW_MASK, (board >> 32) & ROW_MASK, board >> 48)
+
+# Indices 4*i + j of the empty cells
+def empty_cells(board):
+	return [index for index in range(16) if not (board >> (4*index)) & CELL_MASK]
+
+def place(board, index, exponent):
+	return board | (exponent << (4*index))
+
+# Value of the tile at index 4*i + j, 0 if empty
+def tile(board, index):
+	return _tile_value((board >> (4*index)) & CELL_MASK)
+
+def from_matrix(matrix):
+	board = 0
+	for i in range(4):
+		for j in range(4):
+			if matrix[i][j]:
+				board |= (matrix[i][j].bit_length() - 1) << (4*(4*i + j))
+	return board
+
+def to_matrix(board):
+	return [[tile(board, 4*i + j) for j in range(4)] for i in range(4)]